@@ -1,20 +1,51 @@
 # FILE: 01_build_index.py
 # TUGAS: Ingest Dataset Role-Based (CS / Affiliator / Advisor)
+#
+# Mode default = INKREMENTAL:
+#   - setiap produk di-hash (teks + metadata + model embedding)
+#   - hanya produk baru / berubah yang di-embed & di-upsert (id = produk-<id>)
+#   - produk yang hilang dari CSV dihapus
+#   - koleksi TIDAK pernah dikosongkan, server tetap bisa menjawab
+# Mode penuh (hapus koleksi & bangun ulang): python src/01_build_index.py --full
+#
+# Jika FASHA_RETRIEVAL_BACKEND=snapshot (atau dijalankan dengan --snapshot),
+# setiap ada perubahan snapshot read-only (embedding + metadata) untuk
+# server multi-worker dipublish atomik ke FASHA_SNAPSHOT_DIR, per halaman.
+# Publish snapshot dari koleksi yang sudah ada saja (index_version.txt ikut
+# diperbarui agar worker yang sedang jalan memuat snapshot baru):
+#   python src/01_build_index.py --snapshot-only
+#
+# Embedding disimpan di cache disk content-addressed (sha256 model + teks,
+# FASHA_EMBED_CACHE_DB) per batch, dan tiap batch langsung di-upsert.
+# Build yang terputus tinggal dijalankan ulang: batch yang sudah masuk
+# terdeteksi "tetap" oleh diff, sisanya diambil dari cache tanpa API call.
+#
+# index_version.txt berisi sidik koleksi (hash semua id + content_hash).
+# Snapshot & versi ditulis setiap kali sidik tersimpan tidak cocok dengan
+# koleksi — juga jika run sebelumnya mati setelah upsert tapi sebelum
+# versi sempat ditulis (diff run berikutnya kosong).
 
+import sys
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
 import chromadb
 import os
+from datetime import datetime
 from dotenv import load_dotenv
 
-from llama_index.core import (
-    VectorStoreIndex,
-    Document,
-    StorageContext,
-    Settings
-)
-from llama_index.vector_stores.chroma import ChromaVectorStore
+from llama_index.core import Settings
+from llama_index.core.schema import TextNode, MetadataMode, NodeRelationship, RelatedNodeInfo
+from llama_index.core.vector_stores.utils import node_to_metadata_dict
 from llama_index.embeddings.openai import OpenAIEmbedding
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.embedding_cache import CachedEmbedding, EmbeddingStore
+from src.index_snapshot import publish_snapshot, current_version
+from src.vector_engine import occasion_fields, OCCASION_PREFIX
+from src.answer_cache import INDEX_VERSION_FILE, read_index_version
+
 # --- LOAD ENV ---
 load_dotenv()
 
@@ -22,87 +53,248 @@ load_dotenv()
 NAMA_FILE_CSV = "data_klien_1/products_role_based.csv"  # ⬅️ FILE BARU
 NAMA_COLLECTION = "fashion_store"
 DB_PATH = "./chroma_db"
+MODEL_EMBEDDING = "text-embedding-3-small"
+EMBED_CACHE_DB = os.environ.get("FASHA_EMBED_CACHE_DB") or "embedding_cache.db"
+EMBED_BATCH = int(os.environ.get("FASHA_EMBED_BATCH", "100"))
+EMBED_WORKERS = int(os.environ.get("FASHA_EMBED_WORKERS", "4"))
+CSV_CHUNK = int(os.environ.get("FASHA_CSV_CHUNK", "5000"))
+SNAPSHOT_DIR = os.environ.get("FASHA_SNAPSHOT_DIR", "./index_snapshot")
+SNAPSHOT_DTYPE = os.environ.get("FASHA_VECTOR_DTYPE", "float32")
+# Snapshot hanya dibutuhkan backend snapshot → backend lain tidak ikut menanggung biayanya
+SNAPSHOT_AKTIF = (
+    os.environ.get("FASHA_RETRIEVAL_BACKEND", "chroma").lower() == "snapshot"
+    or "--snapshot" in sys.argv
+)
+
+
+KOLOM_LINK = ["product_link", "affiliate_link", "image_url"]
+SEP = "\n        "
+
+
+def render_chunk(df: pd.DataFrame) -> pd.DataFrame:
+    """Teks, metadata & content_hash untuk satu chunk CSV, dibangun per kolom."""
+    for kolom in KOLOM_LINK:
+        if kolom not in df:
+            df[kolom] = ""
+    df[KOLOM_LINK] = df[KOLOM_LINK].astype(object).where(df[KOLOM_LINK].notna(), "")
+    df["id"] = df["id"].astype(int)
+    df["harga"] = df["harga"].astype(int)
+
+    # --- TEXT UTAMA UNTUK VECTOR SEARCH ---
+    # map(str) (bukan astype(str)): sel kosong jadi "nan" seperti f-string lama,
+    # di pandas 3 astype(str) membiarkan NaN sehingga seluruh teks baris jadi NaN
+    s = lambda kolom: df[kolom].map(str)
+    text = (
+        "Nama Produk: " + s("nama_produk")
+        + SEP + "Kategori: " + s("kategori") + " - " + s("sub_kategori")
+        + SEP + "Gender: " + s("gender")
+        + SEP + "Occasion: " + s("occasion")
+        + SEP + "Harga: Rp " + df["harga"].map("{:,}".format)
+        + SEP + "Deskripsi: " + s("deskripsi")
+        + SEP + "Warna: " + s("warna_tersedia")
+        + SEP + "Body Type: " + s("body_type")
+        + SEP + "Skin Tone: " + s("skin_tone")
+    )
+
+    # --- METADATA (UNTUK LOGIC, BUKAN SEMANTIC SEARCH) ---
+    metadata = df.rename(columns={"id": "product_id"})[[
+        "product_id", "nama_produk", "kategori", "sub_kategori", "gender",
+        "occasion", "harga",
+        "tier",  # 🔥 KUNCI PIVOT
+        *KOLOM_LINK,
+    ]].to_dict("records")
+    # tag occasion lowercase per field → filter occasion sama di Chroma & NumPy
+    for m in metadata:
+        m.update(occasion_fields(m["occasion"] if pd.notna(m["occasion"]) else ""))
+
+    # --- HASH KONTEN: dasar diff antar run ---
+    hashes = [
+        hashlib.sha256(
+            json.dumps([MODEL_EMBEDDING, t, m], sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+        for t, m in zip(text, metadata)
+    ]
+
+    return pd.DataFrame({
+        "node_id": "produk-" + df["id"].astype(str),
+        "text": text,
+        "metadata": metadata,
+        "content_hash": hashes,
+    }, index=df.index)
+
+
+def buat_node(node_id: str, text: str, metadata: dict, content_hash: str) -> TextNode:
+    # field occasion_<tag> hanya untuk filter, tidak ikut teks embedding / LLM
+    excluded = ["content_hash", *(k for k in metadata if k.startswith(OCCASION_PREFIX))]
+    return TextNode(
+        id_=node_id,
+        text=text,
+        metadata={**metadata, "content_hash": content_hash},
+        excluded_embed_metadata_keys=excluded,
+        excluded_llm_metadata_keys=excluded,
+        relationships={NodeRelationship.SOURCE: RelatedNodeInfo(node_id=node_id)}
+    )
+
+
+def ambil_hash_lama(collection, page: int = 5000) -> dict:
+    """id → content_hash dari koleksi yang sudah ada (kosong untuk id legacy).
+
+    Diambil per halaman agar _node_content seluruh katalog tidak dimuat sekaligus.
+    """
+    hashes = {}
+    offset = 0
+    while True:
+        existing = collection.get(include=["metadatas"], limit=page, offset=offset)
+        for node_id, meta in zip(existing["ids"], existing["metadatas"]):
+            hashes[node_id] = (meta or {}).get("content_hash", "")
+        if len(existing["ids"]) < page:
+            return hashes
+        offset += page
+
+
+def embed_batch(batch):
+    return Settings.embed_model.get_text_embedding_batch(
+        [n.get_content(metadata_mode=MetadataMode.EMBED) for n in batch]
+    )
+
 
-def build_index():
+def upsert_batch(collection, batch, embeddings):
+    metadatas = []
+    for node in batch:
+        metadata = node_to_metadata_dict(node, remove_text=True, flat_metadata=True)
+        metadatas.append({k: ("" if v is None else v) for k, v in metadata.items()})
+
+    collection.upsert(
+        ids=[n.node_id for n in batch],
+        embeddings=embeddings,
+        metadatas=metadatas,
+        documents=[n.get_content(metadata_mode=MetadataMode.NONE) for n in batch]
+    )
+
+
+def upsert_nodes(collection, nodes):
+    """Embed per batch secara paralel (maks EMBED_WORKERS), upsert tiap batch yang selesai."""
+    batches = [nodes[i:i + EMBED_BATCH] for i in range(0, len(nodes), EMBED_BATCH)]
+    with ThreadPoolExecutor(max_workers=EMBED_WORKERS) as pool:
+        futures = {pool.submit(embed_batch, batch): batch for batch in batches}
+        for i, future in enumerate(as_completed(futures), 1):
+            upsert_batch(collection, futures[future], future.result())
+            print(f"   💾 Batch {i}/{len(batches)} tersimpan")
+
+
+def publish(collection):
+    versi = publish_snapshot(collection, SNAPSHOT_DIR, dtype=SNAPSHOT_DTYPE)
+    print(f"📸 Snapshot {versi} dipublish ke {SNAPSHOT_DIR}")
+
+
+def sidik_koleksi(hashes: dict) -> str:
+    """Sidik isi koleksi: sha256 dari semua pasangan id:content_hash (terurut)."""
+    h = hashlib.sha256()
+    for node_id in sorted(hashes):
+        h.update(f"{node_id}:{hashes[node_id]}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def tandai_versi(versi: str):
+    """Tulis index_version.txt: server memuat ulang index & snapshot saat mtime-nya berubah."""
+    with open(os.path.join(DB_PATH, INDEX_VERSION_FILE), "w", encoding="utf-8") as f:
+        f.write(versi)
+
+
+def build_index(full: bool = False):
     print(f"🚀 Memulai Ingestion Data dari {NAMA_FILE_CSV}...")
 
     if not os.path.exists(NAMA_FILE_CSV):
         print(f"❌ File {NAMA_FILE_CSV} tidak ditemukan!")
         return
 
-    df = pd.read_csv(NAMA_FILE_CSV)
-    print(f"📊 Ditemukan {len(df)} produk.")
-
-    documents = []
-
-    for _, row in df.iterrows():
-        # --- TEXT UTAMA UNTUK VECTOR SEARCH ---
-        text_content = f"""
-        Nama Produk: {row['nama_produk']}
-        Kategori: {row['kategori']} - {row['sub_kategori']}
-        Gender: {row['gender']}
-        Occasion: {row['occasion']}
-        Harga: Rp {int(row['harga']):,}
-        Deskripsi: {row['deskripsi']}
-        Warna: {row['warna_tersedia']}
-        Body Type: {row['body_type']}
-        Skin Tone: {row['skin_tone']}
-        """
-
-        # --- METADATA (UNTUK LOGIC, BUKAN SEMANTIC SEARCH) ---
-        metadata = {
-            "product_id": int(row["id"]),
-            "nama_produk": row["nama_produk"],
-            "kategori": row["kategori"],
-            "sub_kategori": row["sub_kategori"],
-            "gender": row["gender"],
-            "occasion": row["occasion"],
-            "harga": int(row["harga"]),
-            "tier": row["tier"],  # 🔥 KUNCI PIVOT
-            "product_link": row.get("product_link", ""),
-            "affiliate_link": row.get("affiliate_link", ""),
-            "image_url": row.get("image_url", "")
-        }
-
-        doc = Document(
-            text=text_content.strip(),
-            metadata=metadata
-        )
-        documents.append(doc)
-
-    print(f"📦 Total dokumen siap di-ingest: {len(documents)}")
-
     # --- SETUP EMBEDDING ---
     print("⚙️ Menyiapkan Embedding Model...")
-    Settings.embed_model = OpenAIEmbedding(model="text-embedding-3-small")
+    Settings.embed_model = CachedEmbedding(
+        OpenAIEmbedding(model=MODEL_EMBEDDING),
+        max_entries=EMBED_BATCH * EMBED_WORKERS,
+        store=EmbeddingStore(EMBED_CACHE_DB)
+    )
 
     # --- SETUP CHROMADB ---
     db = chromadb.PersistentClient(path=DB_PATH)
 
-    try:
-        db.delete_collection(NAMA_COLLECTION)
-        print("🧹 Koleksi lama dihapus.")
-    except:
-        print("ℹ️ Tidak ada koleksi lama, lanjut membuat baru.")
+    if full:
+        try:
+            db.delete_collection(NAMA_COLLECTION)
+            print("🧹 Koleksi lama dihapus (mode --full).")
+        except:
+            print("ℹ️ Tidak ada koleksi lama, lanjut membuat baru.")
 
     chroma_collection = db.get_or_create_collection(NAMA_COLLECTION)
-    vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
+    hash_lama = ambil_hash_lama(chroma_collection)
 
-    storage_context = StorageContext.from_defaults(
-        vector_store=vector_store
-    )
+    # --- CSV DIBACA PER CHUNK: render → diff → embed → upsert ---
+    # Memori puncak ditentukan CSV_CHUNK, bukan ukuran katalog.
+    total = ditambah = diubah = 0
+    hash_baru = {}  # node_id → content_hash, isi koleksi setelah build
+
+    for chunk in pd.read_csv(NAMA_FILE_CSV, chunksize=CSV_CHUNK):
+        rendered = render_chunk(chunk)
+        total += len(rendered)
+        hash_baru.update(zip(rendered["node_id"], rendered["content_hash"]))
+
+        lama = rendered["node_id"].map(hash_lama)
+        baru = lama.isna()
+        berubah = ~baru & (lama != rendered["content_hash"])
+        ditambah += int(baru.sum())
+        diubah += int(berubah.sum())
 
-    # --- BUILD INDEX ---
-    print("🧠 Memasukkan data ke Vector Store...")
-    VectorStoreIndex.from_documents(
-        documents,
-        storage_context=storage_context,
-        show_progress=True
+        todo = rendered[baru | berubah]
+        if len(todo):
+            nodes = [
+                buat_node(r.node_id, r.text, r.metadata, r.content_hash)
+                for r in todo.itertuples(index=False)
+            ]
+            print(f"🧠 Chunk {total - len(rendered) + 1}–{total}: {len(nodes)} produk ke Vector Store...")
+            upsert_nodes(chroma_collection, nodes)
+
+    dihapus = [node_id for node_id in hash_lama if node_id not in hash_baru]
+    if dihapus:
+        chroma_collection.delete(ids=dihapus)
+
+    print(f"📊 Ditemukan {total} produk.")
+    print(
+        f"🔎 Diff: {ditambah} baru | {diubah} berubah | "
+        f"{len(dihapus)} dihapus | {total - ditambah - diubah} tetap"
     )
+    if ditambah or diubah:
+        cache = Settings.embed_model.stats()
+        print(f"♻️ Embedding dari cache: {cache['hits']} | 🌐 Dipanggil ke API: {cache['misses']}")
+
+    # Versi basi = ada perubahan di run ini, ATAU run sebelumnya terputus
+    # setelah upsert sebelum versi ditulis
+    sidik = sidik_koleksi(hash_baru)
+    basi = bool(ditambah or diubah or dihapus) or read_index_version(DB_PATH) != sidik
+    if basi and not (ditambah or diubah or dihapus):
+        print("♻️ Versi index tidak cocok dengan koleksi (build sebelumnya terputus?), diperbarui.")
+
+    # --- SNAPSHOT MULTI-WORKER (dipublish sebelum versi index diganti) ---
+    if SNAPSHOT_AKTIF and (basi or current_version(SNAPSHOT_DIR) is None):
+        publish(chroma_collection)
+    elif basi and current_version(SNAPSHOT_DIR) is not None:
+        print("ℹ️ Snapshot tidak diperbarui (backend bukan snapshot). "
+              "Jalankan --snapshot-only sebelum memakai FASHA_RETRIEVAL_BACKEND=snapshot.")
+
+    # --- TANDAI VERSI INDEX (server mengosongkan answer cache) ---
+    if basi:
+        tandai_versi(sidik)
 
     print("✅ INGEST SELESAI")
     print("📁 DB Path:", DB_PATH)
     print("📚 Collection:", NAMA_COLLECTION)
 
 if __name__ == "__main__":
-    build_index()
+    if "--snapshot-only" in sys.argv:
+        publish(chromadb.PersistentClient(path=DB_PATH).get_or_create_collection(NAMA_COLLECTION))
+        # isi versi tetap (koleksi tidak berubah → answer cache tidak dikosongkan),
+        # tapi mtime berubah sehingga SnapshotVectorEngine / ProductIndex /
+        # LexicalIndex membaca CURRENT yang baru
+        tandai_versi(read_index_version(DB_PATH) or datetime.now().isoformat())
+    else:
+        build_index(full="--full" in sys.argv)
@@ -5,21 +5,33 @@
 # ======================================================
 
 import os
-import csv
 import re
-from datetime import datetime
+import json
+import time
+import asyncio
+import contextvars
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
 from dotenv import load_dotenv
 
-import chromadb
 from fastapi import FastAPI, HTTPException, Security, Depends
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
 from fastapi.security import APIKeyHeader
 from pydantic import BaseModel
 
-from llama_index.core import VectorStoreIndex, Settings
-from llama_index.vector_stores.chroma import ChromaVectorStore
-from llama_index.embeddings.openai import OpenAIEmbedding
-from llama_index.llms.openai import OpenAI
+# llama_index, chromadb & client OpenAI di-import LAZY di inisialisasi()
 from src.prompts import EMPLOYEE_PROMPT, AFFILIATE_PROMPT, ADVISOR_PROMPT, SEARCH_PROMPT
+from src.concurrency import run_blocking, iterate_blocking, MAX_CONCURRENCY
+from src.admission import AdmissionController, Ditolak
+from src.single_flight import SingleFlight, Siaran
+from src.session_store import SessionState, build_session_store, session_lock
+from src.intent_classifier import IntentClassifier, ORDER_COMMIT_KEYWORDS, ORDER_DETAIL_KEYWORDS, normalize
+from src.answer_cache import SemanticAnswerCache
+from src.transaction_store import TransactionStore
+from src.context_builder import PromptMeter, build_ctx, trim_history, budget
+from src.metrics import metrics
 
 import logging
 
@@ -31,7 +43,7 @@ logging.basicConfig(
 logger = logging.getLogger("FASHA_AI")
 # ===================================================
 
-def log_ai_flow(intent: str, state: str, user_msg: str):
+def log_ai_flow(intent: str, state: str, user_msg: str, source: str = "llm"):
     icon_map = {
         "SEARCH": "🔍",
         "ORDER": "🛒",
@@ -49,10 +61,11 @@ def log_ai_flow(intent: str, state: str, user_msg: str):
     state_icon = state_icon_map.get(state, "⚪")
 
     logger.info(
-        "%s %s AI_FLOW | intent=%s | state=%s | user=\"%s\"",
+        "%s %s AI_FLOW | intent=%s | source=%s | state=%s | user=\"%s\"",
         intent_icon,
         state_icon,
         intent,
+        source,
         state,
         user_msg
     )
@@ -68,10 +81,22 @@ load_dotenv()
 # ======================================================
 class QueryRequest(BaseModel):
     pertanyaan: str
+    session_id: str = "default"
 
 class ChatResponse(BaseModel):
     jawaban: str
 
+class BatchRequest(BaseModel):
+    items: list[QueryRequest]
+
+class BatchItemResponse(BaseModel):
+    session_id: str
+    jawaban: str | None = None
+    error: str | None = None
+
+class BatchResponse(BaseModel):
+    hasil: list[BatchItemResponse]
+
 # ======================================================
 # 2. API SECURITY
 # ======================================================
@@ -86,59 +111,277 @@ async def get_api_key(api_key: str = Security(API_KEY_HEADER)):
     return api_key
 
 # ======================================================
-# 3. INIT LLM & VECTOR DB
+# 3. INIT LLM & VECTOR DB (LAZY, DI LIFESPAN)
 # ======================================================
-if not os.environ.get("OPENAI_API_KEY"):
+# Import llama_index / chromadb, client OpenAI, index & lookup produk
+# dibangun di thread background saat startup → port langsung terbuka,
+# GET / langsung menjawab, GET /ready = 503 sampai semuanya siap.
+# Endpoint chat menunggu inisialisasi selesai (maks STARTUP_TIMEOUT).
+
+# FASHA_OFFLINE_MODELS=1 → LLM & embedding lokal deterministik untuk load
+# test tanpa OpenAI (lihat src/offline_models.py & src/13_load_test.py)
+OFFLINE_MODELS = os.environ.get("FASHA_OFFLINE_MODELS", "0") == "1"
+
+if not OFFLINE_MODELS and not os.environ.get("OPENAI_API_KEY"):
     raise RuntimeError("OPENAI_API_KEY belum diset")
 
-Settings.embed_model = OpenAIEmbedding(model="text-embedding-3-small")
+DB_PATH = "./chroma_db"
+
+# Backend retrieval:
+#   chroma   = llama_index retriever di atas Chroma
+#   numpy    = matriks embedding in-process (disalin dari Chroma per worker)
+#   snapshot = snapshot read-only memory-mapped, dibagi semua worker uvicorn
+#              (tanpa client Chroma; dipublish oleh 01_build_index.py)
+RETRIEVAL_BACKEND = os.environ.get("FASHA_RETRIEVAL_BACKEND", "chroma").lower()
+SNAPSHOT_DIR = os.environ.get("FASHA_SNAPSHOT_DIR", "./index_snapshot")
+
+# BM25 inverted index atas teks produk, digabung dengan skor vector (RRF)
+HYBRID_RETRIEVAL = os.environ.get("FASHA_HYBRID_RETRIEVAL", "1") == "1"
+HYBRID_CANDIDATES = int(os.environ.get("FASHA_HYBRID_CANDIDATES", "20"))
+
+# Warm-up opsional: embed beberapa query umum sebelum dinyatakan siap
+WARMUP = os.environ.get("FASHA_WARMUP", "0") == "1"
+WARMUP_QUERIES = [
+    "Ada outfit yang cocok buat main padel?",
+    "Budget 500 ribu, ada rekomendasi?",
+    "Ada baju renang yang syar'i?",
+    "Rekomendasi baju buat kondangan",
+]
+STARTUP_TIMEOUT = float(os.environ.get("FASHA_STARTUP_TIMEOUT", "120"))
+
+# Diisi oleh inisialisasi()
+Settings = QueryBundle = MetadataFilter = MetadataFilters = FilterOperator = fuse = None
+embed_model = db = collection = vector_store = index = None
+product_index = vector_engine = lexical_index = None
+
+STARTUP = {"status": "loading", "tahap": {}, "error": None}
+_siap = asyncio.Event()
+
+
+@contextmanager
+def tahap(nama: str):
+    mulai = time.perf_counter()
+    try:
+        yield
+    finally:
+        STARTUP["tahap"][nama] = round(time.perf_counter() - mulai, 3)
+
+
+def inisialisasi():
+    global Settings, QueryBundle, MetadataFilter, MetadataFilters, FilterOperator, fuse
+    global occasion_tags, occasion_key
+    global embed_model, db, collection, vector_store, index
+    global product_index, vector_engine, lexical_index
+
+    with tahap("import_llama_index"):
+        from llama_index.core import VectorStoreIndex, Settings, QueryBundle
+        from llama_index.core.vector_stores import MetadataFilter, MetadataFilters, FilterOperator
+        from src.embedding_cache import CachedEmbedding
+        from src.product_index import ProductIndex
+        from src.vector_engine import NumpyVectorEngine, occasion_tags, occasion_key
+        from src.lexical_index import LexicalIndex, fuse
+
+    with tahap("model_clients"):
+        if OFFLINE_MODELS:
+            from src.offline_models import OfflineLLM, OfflineEmbedding
+            logger.warning("⚠️ FASHA_OFFLINE_MODELS=1 → memakai LLM & embedding OFFLINE")
+            inner_embed, llm = OfflineEmbedding.from_env(), OfflineLLM.from_env()
+        else:
+            from llama_index.embeddings.openai import OpenAIEmbedding
+            from llama_index.llms.openai import OpenAI
+            inner_embed = OpenAIEmbedding(model="text-embedding-3-small")
+            try:
+                llm = OpenAI(model="gpt-5-nano", temperature=0.2)
+            except:
+                llm = OpenAI(model="gpt-4o", temperature=0.2)
+
+        # Embedding query di-cache: string yang sama tidak dikirim dua kali ke API
+        embed_model = CachedEmbedding.from_env(inner_embed)
+        Settings.embed_model = embed_model
+        Settings.llm = llm
+
+    if RETRIEVAL_BACKEND == "snapshot":
+        with tahap("snapshot"):
+            # collection = snapshot read-only (API get() sama dengan Chroma)
+            from src.index_snapshot import IndexSnapshot, SnapshotVectorEngine
+            collection = IndexSnapshot(SNAPSHOT_DIR)
+            vector_engine = SnapshotVectorEngine(collection, db_path=DB_PATH)
+        if os.environ.get("FASHA_SESSION_BACKEND", "memory").lower() == "memory":
+            logger.warning(
+                "⚠️ Session backend memory: dengan --workers > 1 state order tiap "
+                "worker berbeda, set FASHA_SESSION_BACKEND=sqlite"
+            )
+    else:
+        with tahap("vector_store"):
+            import chromadb
+            from llama_index.vector_stores.chroma import ChromaVectorStore
+            db = chromadb.PersistentClient(path=DB_PATH)
+            collection = db.get_or_create_collection("fashion_store")
+            vector_store = ChromaVectorStore(chroma_collection=collection)
+            index = VectorStoreIndex.from_vector_store(vector_store)
+
+    with tahap("product_index"):
+        # Lookup nama produk → metadata tanpa vector search (exact + trigram)
+        product_index = ProductIndex(collection, db_path=DB_PATH)
+        len(product_index)
+
+    if RETRIEVAL_BACKEND == "numpy":
+        with tahap("vector_engine"):
+            vector_engine = NumpyVectorEngine(
+                collection,
+                db_path=DB_PATH,
+                dtype=os.environ.get("FASHA_VECTOR_DTYPE", "float32")
+            )
+
+    if HYBRID_RETRIEVAL:
+        with tahap("lexical_index"):
+            lexical_index = LexicalIndex(collection, db_path=DB_PATH, product_index=product_index)
+
 
-try:
-    Settings.llm = OpenAI(model="gpt-5-nano", temperature=0.2)
-except:
-    Settings.llm = OpenAI(model="gpt-4o", temperature=0.2)
+def warm_up():
+    """Pre-embed query umum (isi cache embedding & buka koneksi API) + 1 retrieval."""
+    with tahap("warmup"):
+        embeddings = [embed_query(q) for q in WARMUP_QUERIES]
+        retrieve_neutral(QueryBundle(WARMUP_QUERIES[0], embedding=embeddings[0]))
 
-db = chromadb.PersistentClient(path="./chroma_db")
-collection = db.get_or_create_collection("fashion_store")
-vector_store = ChromaVectorStore(chroma_collection=collection)
-index = VectorStoreIndex.from_vector_store(vector_store)
+
+async def startup():
+    mulai = time.perf_counter()
+    try:
+        await run_blocking(inisialisasi)
+        if WARMUP:
+            await run_blocking(warm_up)
+        STARTUP["status"] = "ready"
+    except Exception as e:
+        STARTUP["status"], STARTUP["error"] = "failed", repr(e)
+        logger.exception("❌ Inisialisasi gagal")
+    finally:
+        STARTUP["tahap"]["total"] = round(time.perf_counter() - mulai, 3)
+        logger.info(
+            "🚀 STARTUP %s | %s",
+            STARTUP["status"],
+            " | ".join(f"{k}={v:.2f}s" for k, v in STARTUP["tahap"].items())
+        )
+        _siap.set()
+
+
+async def siap():
+    """Dependency endpoint chat: tunggu inisialisasi, 503 jika gagal / terlalu lama."""
+    if not _siap.is_set():
+        try:
+            await asyncio.wait_for(_siap.wait(), timeout=STARTUP_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=503, detail="Server masih memuat model")
+    if STARTUP["status"] != "ready":
+        raise HTTPException(status_code=503, detail="Inisialisasi server gagal")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tugas = asyncio.create_task(startup())
+    yield
+    tugas.cancel()
+    transaction_store.close()
+    intent_classifier.close()
 
 # ======================================================
 # 4. FASTAPI INIT
 # ======================================================
-app = FastAPI(title="Fasha AI — Role Based Fashion Assistant")
+app = FastAPI(title="Fasha AI — Role Based Fashion Assistant", lifespan=lifespan)
+
+# Fast-path intent (keyword rules + model n-gram) sebelum jatuh ke LLM
+intent_classifier = IntentClassifier.from_env()
+
+# Cache jawaban SEARCH / CHAT berdasarkan kemiripan embedding pertanyaan
+answer_cache = SemanticAnswerCache.from_env(db_path=DB_PATH)
+
+# Jumlah token tiap prompt ke LLM (budget ada di src/prompts.py)
+prompt_meter = PromptMeter()
+
+# Pesan identik yang sedang diproses → intent & jawaban SEARCH/CHAT dipakai bersama
+single_flight = SingleFlight.from_env()
+
+# Rate limit per API key + batas request in-flight (429 / 503 cepat saat penuh)
+admission = AdmissionController.from_env(max_inflight=MAX_CONCURRENCY)
+
+
+@app.exception_handler(Ditolak)
+async def ditolak_handler(request, exc: Ditolak):
+    metrics.rejected.inc(exc.status_code)
+    logger.warning("🚦 DITOLAK %d | %s | %s", exc.status_code, request.url.path, exc.detail)
+    return JSONResponse(
+        {"detail": exc.detail},
+        status_code=exc.status_code,
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))}
+    )
+
+# Tiket admission request yang sedang berjalan (ikut ke task leader
+# single-flight lewat contextvars)
+_tiket_admission = contextvars.ContextVar("fasha_tiket_admission", default=None)
+
+async def masuk_admission(req, api_key: str, antre: float = None, ukur: bool = True):
+    """Tiket admission untuk satu pesan → (tiket, lepas).
+
+    Pesan identik yang sedang diproses request lain → calon follower
+    single-flight: hanya kena rate limit, tanpa slot in-flight.
+    """
+    pesan = normalize(req.pertanyaan)
+    ikut = single_flight.tandai(pesan)
+    try:
+        if antre is None:
+            tiket = await admission.masuk(api_key, ukur=ukur, slot=not ikut)
+        else:
+            tiket = await admission.masuk_antre(api_key, antre, ukur=ukur, slot=not ikut)
+    except BaseException:
+        single_flight.lepas(pesan)
+        raise
+
+    def lepas():
+        if not tiket.selesai:
+            admission.keluar(tiket)
+            single_flight.lepas(pesan)
+
+    return tiket, lepas
+
+@asynccontextmanager
+async def admisi(req, api_key: str, antre: float = None, ukur: bool = True):
+    tiket, lepas = await masuk_admission(req, api_key, antre=antre, ukur=ukur)
+    _tiket_admission.set(tiket)
+    try:
+        yield
+    finally:
+        lepas()
+
+async def butuh_slot():
+    """Calon follower ternyata mengerjakan LLM sendiri → ambil slot in-flight sekarang."""
+    tiket = _tiket_admission.get()
+    if tiket is not None and not tiket.slot:
+        await admission.ambil_slot(tiket)
 
 # ======================================================
-# 5. MEMORY & ORDER STATE
+# 5. MEMORY & ORDER STATE (PER SESSION)
 # ======================================================
-CHAT_HISTORY = []
-ORDER_STATE = "IDLE"
+# History & ORDER_STATE disimpan per session_id, lihat src/session_store.py
 # IDLE | AWAITING_CONFIRMATION | COLLECTING_DATA | WAITING_PAYMENT
+session_store = build_session_store()
 
 
 # ======================================================
 # 6. TRANSACTION STORAGE
 # ======================================================
-FILE_TRANSAKSI = "data_transaksi.csv"
+# Disimpan di SQLite (WAL) lewat writer background, lihat src/transaction_store.py
+# Import CSV lama sekali jalan: python src/12_import_transaksi.py
+transaction_store = TransactionStore.from_env()
 
-def simpan_pesanan(nama, item, alamat, harga):
-    try:
-        file_exists = os.path.isfile(FILE_TRANSAKSI)
-        with open(FILE_TRANSAKSI, "a", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            if not file_exists:
-                writer.writerow(["Tanggal", "Nama", "Item", "Harga", "Alamat", "Status"])
-            writer.writerow([
-                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                nama, item, harga, alamat, "PENDING"
-            ])
-        return True
-    except:
-        return False
+@metrics.timed("storage")
+def simpan_pesanan(session_id, nama, item, alamat, harga):
+    """Masuk antrian writer (tidak menunggu disk) → order_id."""
+    return transaction_store.simpan(session_id, nama, item, alamat, harga)
 
 # ======================================================
 # 7. LLM — INTENT DETECTOR
 # ======================================================
+@metrics.timed("intent_llm", llm=True)
 def llm_detect_intent(user_message: str) -> str:
     prompt = f"""
 Tugas kamu adalah mengklasifikasikan NIAT UTAMA user ke SATU intent saja.
@@ -235,6 +478,7 @@ CHAT
 PESAN USER:
 "{user_message}"
 """
+    prompt_meter.record("INTENT", prompt)
     return Settings.llm.complete(prompt).text.strip().upper()
 
 
@@ -242,6 +486,7 @@ PESAN USER:
 # ======================================================
 # 8. LLM — MODE DETECTOR (AFTER SEARCH)
 # ======================================================
+@metrics.timed("mode_llm", llm=True)
 def llm_detect_mode(user_message: str) -> str:
     prompt = f"""
 Tentukan MODE respon AI yang PALING TEPAT untuk user.
@@ -306,27 +551,223 @@ ADVISOR
 PESAN USER:
 "{user_message}"
 """
+    prompt_meter.record("MODE", prompt)
     return Settings.llm.complete(prompt).text.strip().upper()
 
 
+# ======================================================
+# 8B. LLM — COMBINED ROUTER (INTENT + MODE + ORDER)
+# ======================================================
+# two_call : llm_detect_intent, lalu ekstrak_order jika ORDER (default)
+# combined : SATU completion JSON berisi intent, mode & data order
+ROUTER_MODE = os.environ.get("FASHA_ROUTER_MODE", "two_call").lower()
+
+@metrics.timed("router_llm", llm=True)
+def llm_route(user_message: str, history: str) -> dict:
+    prompt = f"""
+Kamu adalah router untuk asisten belanja fashion Zaneva Store.
+Analisa PESAN TERAKHIR user (dengan konteks CHAT) lalu isi JSON di bawah.
+
+INTENT (pilih satu):
+- SEARCH : user mencari / minta rekomendasi produk, menyebut kebutuhan,
+           aktivitas atau budget TANPA memilih produk spesifik
+           (contoh: "Ada outfit yang cocok buat main padel?", "Budget 500 ribu, ada rekomendasi?")
+- ORDER  : user SUDAH memilih produk secara jelas (nama produk, ukuran, warna,
+           jumlah, "saya pesan...", "checkout", "kirim ke alamat...")
+           (contoh: "Saya pesan Aylee Set ukuran M", "Jadi beli yang nomor 2")
+- CHAT   : ngobrol, minta tips / edukasi / opini tanpa fokus mencari produk
+           (contoh: "Apa bedanya katun dan linen?", "Baju syar'i itu seperti apa?")
+
+MODE (pilih satu):
+- EMPLOYEE  : user mencari produk yang wajar dijual Zaneva Store
+- AFFILIATE : user mencari produk yang kemungkinan TIDAK dijual Zaneva
+- ADVISOR   : user hanya ingin saran / ide / edukasi
+
+ORDER (isi hanya jika intent ORDER, selain itu biarkan kosong):
+nama, alamat, item (nama produk), size, qty, unit_price
+
+Format JSON WAJIB (tanpa teks lain):
+{{"intent":"","mode":"","status":"","nama":"","alamat":"","item":"","size":"","qty":1,"unit_price":0}}
+
+CHAT:
+{history}
+
+PESAN TERAKHIR:
+{user_message}
+"""
+    try:
+        prompt_meter.record("ROUTER", prompt)
+        data = json.loads(Settings.llm.complete(prompt).text)
+    except Exception:
+        return {"intent": None}
+
+    data["intent"] = str(data.get("intent") or "").strip().upper() or None
+    data["mode"] = str(data.get("mode") or "").strip().upper() or None
+    try:
+        data["qty"] = int(data.get("qty") or 1)
+        data["unit_price"] = int(
+            re.sub(r"[^\d]", "", str(data.get("unit_price", 0))) or 0
+        )
+    except (TypeError, ValueError):
+        data["qty"], data["unit_price"] = 1, 0
+    return data
+
+
 # ======================================================
 # 9. DATA RETRIEVAL (PURE PYTHON)
 # ======================================================
-def retrieve_by_tier(query: str, tier: str, top_k: int = 5):
-    retriever = index.as_retriever(similarity_top_k=top_k)
-    nodes = retriever.retrieve(query)
-    return [
-        n for n in nodes
-        if n.metadata.get("tier") == tier
-    ]
-    
-def retrieve_neutral(query: str, top_k: int = 5):
-    retriever = index.as_retriever(similarity_top_k=top_k)
-    return retriever.retrieve(query)
+# Filter metadata dieksekusi DI DALAM query Chroma (bukan post-filter),
+# dan retriever untuk kombinasi filter yang sama dibuat sekali saja.
+@lru_cache(maxsize=256)
+def get_retriever(
+    top_k: int = 5,
+    tier: str = None,
+    gender: str = None,
+    kategori: str = None,
+    occasion: str = None,
+    min_harga: int = None,
+    max_harga: int = None,
+):
+    filters = []
+    for key, value in (("tier", tier), ("gender", gender), ("kategori", kategori)):
+        if value:
+            filters.append(MetadataFilter(key=key, value=value, operator=FilterOperator.EQ))
+    if min_harga is not None:
+        filters.append(MetadataFilter(key="harga", value=int(min_harga), operator=FilterOperator.GTE))
+    if max_harga is not None:
+        filters.append(MetadataFilter(key="harga", value=int(max_harga), operator=FilterOperator.LTE))
+
+    # occasion: field occasion_<tag> dari build, aturan sama dengan FacetColumns
+    for tag in occasion_tags(occasion):
+        filters.append(MetadataFilter(key=occasion_key(tag), value=1, operator=FilterOperator.EQ))
+
+    return index.as_retriever(
+        similarity_top_k=top_k,
+        filters=MetadataFilters(filters=filters) if filters else None,
+    )
+
+def engine_search(query: "str | QueryBundle", top_k: int = 5, **facets):
+    """Top-k via NumpyVectorEngine; embedding query dipakai ulang jika sudah ada."""
+    if isinstance(query, str):
+        query = QueryBundle(query)
+    embedding = query.embedding or Settings.embed_model.get_query_embedding(query.query_str)
+    return vector_engine.search(embedding, top_k=top_k, **facets)
+
+def retrieve_by_tier(query: "str | QueryBundle", tier: str, top_k: int = 5, **facets):
+    if vector_engine is not None:
+        return engine_search(query, top_k, tier=tier, **facets)
+    return get_retriever(top_k, tier=tier, **facets).retrieve(query)
+
+def retrieve_neutral(query: "str | QueryBundle", top_k: int = 5, **facets):
+    if vector_engine is not None:
+        return engine_search(query, top_k, **facets)
+    return get_retriever(top_k, **facets).retrieve(query)
+
+def retrieve_hybrid(query: "QueryBundle", top_k: int = 5, **facets):
+    """Kandidat vector + BM25 dengan filter yang sama, digabung via RRF."""
+    vector_nodes = retrieve_neutral(query, top_k=HYBRID_CANDIDATES, **facets)
+    lexical_nodes = lexical_index.search(query.query_str, top_k=HYBRID_CANDIDATES, **facets)
+    return fuse(vector_nodes, lexical_nodes, top_k=top_k)
+
+@metrics.timed("embedding")
+def embed_query(text: str) -> list:
+    return Settings.embed_model.get_query_embedding(text)
+
+def cari_nama_persis(pertanyaan: str):
+    """Query menyebut nama produk → node langsung, tanpa embedding.
+
+    Filter dari pertanyaan (budget) ikut diterapkan, sama seperti hybrid search.
+    Blocking (bisa memuat ulang index setelah re-index) → panggil lewat run_blocking.
+    """
+    if lexical_index is None:
+        return []
+    return lexical_index.exact_match(pertanyaan, **filter_pertanyaan(pertanyaan))
+
+# Konteks SEARCH yang sudah dihitung sekaligus oleh /chat/batch
+# (pertanyaan → nodes), ikut ke task & thread executor lewat contextvars
+_konteks_batch = contextvars.ContextVar("fasha_konteks_batch", default=None)
+
+@metrics.timed("vector_search")
+async def cari_konteks_search(pertanyaan: str, query_embedding: list):
+    prefetch = _konteks_batch.get()
+    if prefetch is not None and pertanyaan in prefetch:
+        return prefetch[pertanyaan]
+
+    query_bundle = QueryBundle(pertanyaan, embedding=query_embedding)
+    budget = parse_budget(pertanyaan)
+    retrieve = retrieve_hybrid if lexical_index is not None else retrieve_neutral
+
+    nodes = await run_blocking(retrieve, query_bundle, max_harga=budget)
+    if not nodes and budget:
+        # tidak ada produk di bawah budget → tampilkan yang terdekat
+        nodes = await run_blocking(retrieve, query_bundle)
+    return nodes
+
+def retrieve_batch(daftar: list, embeddings: list) -> dict:
+    """Versi batch cari_konteks_search: satu perkalian matriks untuk semua query."""
+    budgets = [parse_budget(p) for p in daftar]
+    top_k = HYBRID_CANDIDATES if lexical_index is not None else 5
+
+    def cari(indeks: list, pakai_budget: bool) -> list:
+        facets = [{"max_harga": budgets[i] if pakai_budget else None} for i in indeks]
+        hasil = vector_engine.search_many([embeddings[i] for i in indeks], top_k=top_k, facets=facets)
+        if lexical_index is None:
+            return hasil
+        return [
+            fuse(nodes, lexical_index.search(daftar[i], top_k=HYBRID_CANDIDATES, **f), top_k=5)
+            for i, nodes, f in zip(indeks, hasil, facets)
+        ]
+
+    hasil = cari(list(range(len(daftar))), pakai_budget=True)
+    # tidak ada produk di bawah budget → tampilkan yang terdekat
+    kosong = [i for i, nodes in enumerate(hasil) if not nodes and budgets[i]]
+    for i, nodes in zip(kosong, cari(kosong, pakai_budget=False) if kosong else []):
+        hasil[i] = nodes
+    return dict(zip(daftar, hasil))
+
+# ------------------------------------------------------
+# Retrieval spekulatif: dijalankan BERSAMAAN dengan deteksi intent
+# via LLM, hasilnya dibuang jika intent ternyata bukan SEARCH.
+# ------------------------------------------------------
+SPECULATIVE_RETRIEVAL = os.environ.get("FASHA_SPECULATIVE_RETRIEVAL", "1") == "1"
+SPEKULASI = Counter()  # started | used | wasted | saved_s
+
+async def spekulasi_search(pertanyaan: str):
+    mulai = time.perf_counter()
+    nodes = await run_blocking(cari_nama_persis, pertanyaan)
+    if nodes:
+        return None, nodes, time.perf_counter() - mulai
+    query_embedding = await run_blocking(embed_query, pertanyaan)
+    nodes = await cari_konteks_search(pertanyaan, query_embedding)
+    return query_embedding, nodes, time.perf_counter() - mulai
+
+def speculation_stats() -> dict:
+    used, started = SPEKULASI["used"], SPEKULASI["started"]
+    return {
+        "enabled": SPECULATIVE_RETRIEVAL,
+        "started": started,
+        "used": used,
+        "wasted": SPEKULASI["wasted"],
+        "wasted_rate": round(SPEKULASI["wasted"] / started, 4) if started else 0.0,
+        "avg_saved_ms": round(1000 * SPEKULASI["saved_s"] / used, 1) if used else 0.0,
+    }
+
+def parse_budget(text: str):
+    """'budget 500 ribu' / '500rb' / '1,5 juta' → batas harga (Rupiah)."""
+    match = re.search(r"(\d+(?:[.,]\d+)?)\s*(jt|juta|rb|ribu|k)\b", text.lower())
+    if not match:
+        return None
+    angka = float(match.group(1).replace(",", "."))
+    return int(angka * (1_000_000 if match.group(2) in ("jt", "juta") else 1_000))
+
+def filter_pertanyaan(pertanyaan: str) -> dict:
+    """Filter retrieval yang diturunkan dari teks pertanyaan (ikut key answer cache)."""
+    return {"max_harga": parse_budget(pertanyaan)}
 
 # ======================================================
 # 10. ORDER EXTRACTION
 # ======================================================
+@metrics.timed("order_extraction", llm=True)
 def ekstrak_order(pesan: str, history: str):
     prompt = f"""
 Ekstrak data order dari chat berikut.
@@ -341,7 +782,7 @@ PESAN TERAKHIR:
 {pesan}
 """
     try:
-        import json
+        prompt_meter.record("ORDER", prompt)
         data = json.loads(Settings.llm.complete(prompt).text)
         data["qty"] = int(data.get("qty", 1))
         data["unit_price"] = int(
@@ -351,52 +792,317 @@ PESAN TERAKHIR:
     except:
         return {"status": "INCOMPLETE", "qty": 1, "unit_price": 0}
 
+def cari_produk(item: str):
+    """Nama item → metadata produk. Vector search hanya jika lookup nama gagal."""
+    product = product_index.resolve(item)
+    if product is not None:
+        return product
+    nodes = retrieve_neutral(item, top_k=1)
+    return nodes[0].metadata if nodes else None
+
 def ambil_harga(item: str) -> int:
-    nodes = index.as_retriever(similarity_top_k=1).retrieve(item)
-    if not nodes:
+    product = cari_produk(item)
+    if not product:
         return 0
-    match = re.search(r"(\d{3,})", nodes[0].text)
-    return int(match.group()) if match else 0
+    return int(product.get("harga") or 0)
 
 def is_order_commitment(text: str) -> bool:
     text = text.lower()
 
-    commit_keywords = [
-        "saya pesan",
-        "jadi pesan",
-        "jadi beli",
-        "checkout",
-        "order sekarang",
-        "ambil yang ini",
-        "saya mau pesan",
-        "saya mau beli",
-        "saya mau order",
-    ]
-
-
-    detail_keywords = [
-        "size",
-        "ukuran",
-        "pcs",
-        "buah",
-        "qty"
-    ]
-
-    return any(k in text for k in commit_keywords) or any(k in text for k in detail_keywords)
+    # Keyword dipakai bersama dengan fast-path intent classifier
+    return (
+        any(k in text for k in ORDER_COMMIT_KEYWORDS)
+        or any(k in text for k in ORDER_DETAIL_KEYWORDS)
+    )
 
 # ======================================================
 # 11. MAIN ENDPOINT
 # ======================================================
-@app.post("/chat", response_model=ChatResponse, dependencies=[Depends(get_api_key)])
-async def chat_endpoint(req: QueryRequest):
-    global CHAT_HISTORY, ORDER_STATE
+@dataclass
+class Balasan:
+    """Hasil pipeline: jawaban jadi, ATAU siaran jawaban SEARCH/CHAT (bisa dipakai bersama)."""
+    jawaban: str = ""
+    siaran: Siaran = None
+
+
+async def jawab_pesan(req: QueryRequest, endpoint: str) -> str:
+    """Satu pesan /chat atau item /chat/batch: state session → pipeline → jawaban."""
+    with metrics.request(endpoint):
+        async with session_lock(req.session_id):
+            state = await session_store.aget(req.session_id)
+            balasan = await proses_chat(req, state)
+
+            jawaban = balasan.jawaban
+            if balasan.siaran is not None:
+                jawaban = await balasan.siaran.hasil()
+                state.history.append(f"Bot: {jawaban}")
+
+            with metrics.stage("session_storage"):
+                await session_store.asave(req.session_id, state)
+    return jawaban
+
+
+@app.post("/chat", response_model=ChatResponse, dependencies=[Depends(siap)])
+async def chat_endpoint(req: QueryRequest, api_key: str = Depends(get_api_key)):
+    async with admisi(req, api_key):
+        jawaban = await jawab_pesan(req, "/chat")
+    return ChatResponse(jawaban=jawaban)
 
-    CHAT_HISTORY.append(f"User: {req.pertanyaan}")
-    CHAT_HISTORY = CHAT_HISTORY[-15:]
-    history_text = "\n".join(CHAT_HISTORY)
+
+# ------------------------------------------------------
+# /chat/batch: replay inbox marketplace & evaluation set malam hari.
+# Pesan unik (kecuali ORDER) di-embed sekaligus (paralel, masuk cache embedding sehingga
+# pipeline per item tidak memanggil API lagi), retrieval dihitung
+# dengan satu perkalian matriks (backend numpy / snapshot), lalu pesan
+# diproses dengan jumlah LLM paralel terbatas. Pesan dalam session yang
+# sama tetap berurutan. Setiap ITEM dihitung admission control seperti
+# satu /chat (token rate limit + slot in-flight); item yang ditolak
+# menunggu Retry-After sampai FASHA_BATCH_ADMISSION_TIMEOUT detik.
+# ------------------------------------------------------
+BATCH_MAX_ITEMS = int(os.environ.get("FASHA_BATCH_MAX_ITEMS", "1000"))
+BATCH_CONCURRENCY = int(os.environ.get("FASHA_BATCH_CONCURRENCY", "8"))
+BATCH_ADMISSION_TIMEOUT = float(os.environ.get("FASHA_BATCH_ADMISSION_TIMEOUT", "120"))
+
+async def embed_batch(daftar: list) -> dict:
+    """Embedding semua pesan sekaligus → {pesan: embedding}.
+
+    Jika panggilan batch gagal (mis. satu pesan ditolak API embedding),
+    pesan di-embed satu per satu dan yang gagal dilewati; item tersebut
+    nanti melaporkan error-nya sendiri di jalur per item.
+    """
+    try:
+        embeddings = await run_blocking(
+            embed_model.get_query_embeddings, daftar, BATCH_CONCURRENCY
+        )
+        return dict(zip(daftar, embeddings))
+    except Exception as e:
+        logger.warning("⚠️ BATCH | embedding batch gagal (%s), ulangi per pesan", e)
+
+    hasil = await asyncio.gather(
+        *(run_blocking(embed_model.get_query_embedding, p) for p in daftar),
+        return_exceptions=True
+    )
+    return {p: e for p, e in zip(daftar, hasil) if not isinstance(e, BaseException)}
+
+
+async def siapkan_batch(items: list):
+    """Embedding + retrieval vektor untuk pesan unik yang memakainya.
+
+    ORDER tidak memakai embedding maupun retrieval, CHAT hanya embedding
+    (answer cache). Kegagalan di sini tidak menggagalkan batch: pesan yang
+    tidak ter-prefetch diproses lewat jalur per item.
+    """
+    tebakan = {
+        p: intent_classifier.tebak(p)[0]
+        for p in dict.fromkeys(item.pertanyaan for item in items) if p.strip()
+    }
+    daftar = [p for p, intent in tebakan.items() if intent != "ORDER"]
+    if not daftar:
+        return None
+    with metrics.stage("embedding"):
+        embeddings = await embed_batch(daftar)
+    if vector_engine is None:
+        return None
+
+    # intent None → ditentukan LLM nanti, bisa jadi SEARCH
+    cari = [p for p in daftar if p in embeddings and tebakan[p] in (None, "SEARCH")]
+    if not cari:
+        return None
+    try:
+        with metrics.stage("vector_search"):
+            return await run_blocking(retrieve_batch, cari, [embeddings[p] for p in cari])
+    except Exception as e:
+        logger.warning("⚠️ BATCH | retrieval batch gagal (%s), pakai jalur per item", e)
+        return None
+
+
+async def proses_satu(req: QueryRequest, api_key: str) -> BatchItemResponse:
+    """Satu item batch seperti /chat. Ditolak (admission) diteruskan ke pemanggil."""
+    async with admisi(req, api_key, antre=BATCH_ADMISSION_TIMEOUT, ukur=False):
+        try:
+            jawaban = await jawab_pesan(req, "/chat/batch")
+            return BatchItemResponse(session_id=req.session_id, jawaban=jawaban)
+        except Exception as e:
+            logger.exception("❌ BATCH | session=%s | %s", req.session_id, e)
+            return BatchItemResponse(session_id=req.session_id, error=f"{type(e).__name__}: {e}")
+
+
+@app.post("/chat/batch", response_model=BatchResponse, dependencies=[Depends(siap)])
+async def chat_batch_endpoint(req: BatchRequest, api_key: str = Depends(get_api_key)):
+    if len(req.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Maksimal {BATCH_MAX_ITEMS} item per batch"
+        )
+
+    _konteks_batch.set(await siapkan_batch(req.items))
+
+    # pesan per session diproses berurutan, antar session paralel (terbatas)
+    per_session = {}
+    for i, item in enumerate(req.items):
+        per_session.setdefault(item.session_id, []).append(i)
+
+    hasil = [None] * len(req.items)
+    slot_llm = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def jalankan(indeks: list):
+        for n, i in enumerate(indeks):
+            try:
+                async with slot_llm:
+                    hasil[i] = await proses_satu(req.items[i], api_key)
+            except Ditolak as e:
+                # pesan berikutnya di session ini bergantung pada pesan yang ditolak
+                metrics.rejected.inc(e.status_code)
+                for j in indeks[n:]:
+                    hasil[j] = BatchItemResponse(
+                        session_id=req.items[j].session_id,
+                        error=f"{e.status_code}: {e.detail}"
+                    )
+                return
+
+    await asyncio.gather(*(jalankan(indeks) for indeks in per_session.values()))
+
+    logger.info(
+        "📦 BATCH | items=%d | sessions=%d | error=%d",
+        len(hasil), len(per_session), sum(h.error is not None for h in hasil)
+    )
+    return BatchResponse(hasil=hasil)
+
+
+def sse(data: dict, event: str = None) -> str:
+    payload = f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+    return f"event: {event}\n{payload}" if event else payload
+
+
+class StreamDenganSlot(StreamingResponse):
+    """StreamingResponse yang melepas slot admission saat response berakhir,
+    termasuk jika dibatalkan sebelum body sempat diiterasi."""
+
+    def __init__(self, content, lepas, **kwargs):
+        super().__init__(content, **kwargs)
+        self.lepas = lepas
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.lepas()
+
+
+@app.post("/chat/stream", dependencies=[Depends(siap)])
+async def chat_stream_endpoint(req: QueryRequest, api_key: str = Depends(get_api_key)):
+    """Sama seperti /chat, tapi jawaban LLM dikirim token demi token (SSE)."""
+    # slot diambil SEBELUM response dimulai agar penolakan tetap 429 / 503,
+    # dan dilepas oleh StreamDenganSlot setelah seluruh response berakhir
+    tiket, lepas = await masuk_admission(req, api_key, ukur=False)
+
+    async def event_stream():
+        _tiket_admission.set(tiket)
+        try:
+            with metrics.request("/chat/stream"):
+                async with session_lock(req.session_id):
+                    state = await session_store.aget(req.session_id)
+                    balasan = await proses_chat(req, state)
+
+                    if balasan.siaran is None:
+                        yield sse({"delta": balasan.jawaban})
+                    else:
+                        potongan = []
+                        async for delta in balasan.siaran.ikuti():
+                            potongan.append(delta)
+                            yield sse({"delta": delta})
+                        state.history.append(f"Bot: {''.join(potongan)}")
+
+                    with metrics.stage("session_storage"):
+                        await session_store.asave(req.session_id, state)
+        except Ditolak as e:
+            # calon follower yang ternyata butuh slot sendiri, ditolak saat stream sudah jalan
+            metrics.rejected.inc(e.status_code)
+            yield sse({"error": e.detail, "retry_after": max(1, round(e.retry_after))}, event="error")
+            return
+
+        yield sse({}, event="done")
+
+    return StreamDenganSlot(
+        event_stream(),
+        lepas,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def deteksi_intent(pesan: str) -> str:
+    await butuh_slot()
+    intent = await run_blocking(llm_detect_intent, pesan)
+    intent_classifier.record_decision(pesan, intent)
+    return intent
+
+
+async def jawab_search_chat(siaran: Siaran, intent: str, pertanyaan: str, spekulasi=None):
+    """Pipeline SEARCH / CHAT (embedding → cache → retrieval → generation) ke siaran."""
+    await butuh_slot()
+    nodes = None
+    if spekulasi is not None:
+        mulai_tunggu = time.perf_counter()
+        query_embedding, nodes, durasi = await spekulasi
+        # yang dihemat = durasi retrieval yang sudah overlap dengan deteksi intent
+        hemat = max(0.0, durasi - (time.perf_counter() - mulai_tunggu))
+    else:
+        # 🎯 Nama produk disebut persis → konteks tanpa panggilan embedding
+        nodes = await run_blocking(cari_nama_persis, pertanyaan) if intent == "SEARCH" else []
+        query_embedding = None if nodes else await run_blocking(
+            embed_query, pertanyaan
+        )
+        nodes = nodes or None
+
+    # ⚡ Pertanyaan mirip sudah pernah dijawab → langsung dari cache
+    # (hanya jika filter retrieval-nya sama, mis. budget yang sama)
+    filters = filter_pertanyaan(pertanyaan)
+    cached = (
+        answer_cache.lookup(intent, query_embedding, filters)
+        if query_embedding is not None else None
+    )
+
+    if spekulasi is not None and cached is None:
+        SPEKULASI["used"] += 1
+        SPEKULASI["saved_s"] += hemat
+    elif spekulasi is not None:
+        SPEKULASI["wasted"] += 1
+
+    if cached is not None:
+        await siaran.kirim(cached)
+        return
+
+    if intent == "SEARCH":
+        if nodes is None:
+            nodes = await cari_konteks_search(pertanyaan, query_embedding)
+
+        # Produk ringkas dari metadata, tanpa duplikat, dalam budget token
+        ctx = build_ctx(nodes, budget("SEARCH", "ctx"))
+        prompt = SEARCH_PROMPT.format(question=pertanyaan, ctx=ctx)
+        prompt_meter.record("SEARCH", prompt)
+    else:
+        prompt = ADVISOR_PROMPT.format(question=pertanyaan)
+        prompt_meter.record("ADVISOR", prompt)
+
+    potongan = []
+    with metrics.stage("generation", llm=True):
+        async for chunk in iterate_blocking(Settings.llm.stream_complete, prompt):
+            if chunk.delta:
+                potongan.append(chunk.delta)
+                await siaran.kirim(chunk.delta)
+
+    if query_embedding is not None:
+        answer_cache.store(intent, query_embedding, "".join(potongan), filters)
+
+
+async def proses_chat(req: QueryRequest, state: SessionState) -> Balasan:
+    state.history.append(f"User: {req.pertanyaan}")
+    state.history = state.history[-15:]
+    history_text = trim_history(state.history, budget("ROUTER", "history"))
     
     # 🔒 POST-ORDER GUARD (SETELAH PESANAN SELESAI)
-    if ORDER_STATE == "WAITING_PAYMENT":
+    if state.order_state == "WAITING_PAYMENT":
 
         pesan_lower = req.pertanyaan.lower()
 
@@ -409,7 +1115,12 @@ async def chat_endpoint(req: QueryRequest):
             "bukti transfer",
             "saya sudah transfer"
         ]):
-            ORDER_STATE = "IDLE"
+            state.order_state = "IDLE"
+            # hanya pesanan milik percakapan ini (session "default" bisa dipakai
+            # bersama oleh banyak klien tanpa session_id)
+            if state.order_id:
+                transaction_store.update_status(state.order_id, "PAID")
+            state.order_id = None
 
             jawaban = (
                 "Terima kasih Kak 🙏\n\n"
@@ -418,8 +1129,8 @@ async def chat_endpoint(req: QueryRequest):
                 "Jika ada yang ingin ditanyakan lagi, silakan ya Kak 😊"
             )
 
-            CHAT_HISTORY.append(f"Bot: {jawaban}")
-            return ChatResponse(jawaban=jawaban)
+            state.history.append(f"Bot: {jawaban}")
+            return Balasan(jawaban=jawaban)
 
         # ❗ BELUM ADA KONFIRMASI PEMBAYARAN
         jawaban = (
@@ -429,29 +1140,67 @@ async def chat_endpoint(req: QueryRequest):
             "Jika sudah, kirimkan bukti transfer di chat ini 😊"
         )
 
-        CHAT_HISTORY.append(f"Bot: {jawaban}")
-        return ChatResponse(jawaban=jawaban)
+        state.history.append(f"Bot: {jawaban}")
+        return Balasan(jawaban=jawaban)
 
 
 
     # 🔐 INTENT LOCK (WAJIB)
-    if ORDER_STATE in [
+    if state.order_state in [
         "AWAITING_CONFIRMATION",
         "COLLECTING_DATA",
         "WAITING_PAYMENT"
     ]:
-        intent = "ORDER"
+        intent, source = "ORDER", "lock"
     else:
-        intent = llm_detect_intent(req.pertanyaan)
+        intent, source = intent_classifier.classify(req.pertanyaan)
+
+    # ⚡ Intent harus ditanya ke LLM → mulai retrieval SEARCH secara paralel
+    spekulasi = None
+    if intent is None and SPECULATIVE_RETRIEVAL:
+        spekulasi = asyncio.create_task(spekulasi_search(req.pertanyaan))
+        spekulasi.add_done_callback(lambda t: t.cancelled() or t.exception())
+        SPEKULASI["started"] += 1
+
+    # Mode combined: intent + data order didapat dari SATU panggilan LLM
+    routed = None
+    if intent is None and ROUTER_MODE == "combined":
+        await butuh_slot()
+        routed = await run_blocking(llm_route, req.pertanyaan, history_text)
+        if routed["intent"] in ("SEARCH", "ORDER", "CHAT"):
+            intent, source = routed["intent"], "router"
+            intent_classifier.record_decision(req.pertanyaan, intent)
+            logger.info("🧭 ROUTER | intent=%s | mode=%s", intent, routed.get("mode"))
+        else:
+            routed = None
 
-    log_ai_flow(intent, ORDER_STATE, req.pertanyaan)
+    if intent is None:
+        # intent LLM hanya bergantung pada pesan → pesan identik dideteksi sekali
+        intent = await single_flight.do(
+            ("INTENT", normalize(req.pertanyaan)),
+            lambda: deteksi_intent(req.pertanyaan)
+        )
+
+    log_ai_flow(intent, state.order_state, req.pertanyaan, source)
+
+    if spekulasi is not None and intent != "SEARCH":
+        spekulasi.cancel()
+        SPEKULASI["wasted"] += 1
+        spekulasi = None
 
-    
     jawaban = ""
 
     # ================= ORDER =================
     if intent == "ORDER":
-        data = ekstrak_order(req.pertanyaan, history_text)
+        await butuh_slot()
+        if routed is not None:
+            data = routed
+        else:
+            data = await run_blocking(
+                ekstrak_order,
+                req.pertanyaan,
+                trim_history(state.history, budget("ORDER", "history"))
+            )
 
         item_name = (data.get("item") or "").strip()
         qty = data.get("qty")
@@ -463,31 +1212,31 @@ async def chat_endpoint(req: QueryRequest):
         # 1️⃣ ITEM BELUM JELAS → STOP
         # ==================================================
         if not item_name or len(item_name) < 3:
-            ORDER_STATE = "COLLECTING_DATA"
+            state.order_state = "COLLECTING_DATA"
             jawaban = (
                 "Siap Kak 😊\n"
                 "Produk yang mana ya?\n"
                 "Tolong sebutkan **nama produk** agar tidak salah 🙏"
             )
-            CHAT_HISTORY.append(f"Bot: {jawaban}")
-            return ChatResponse(jawaban=jawaban)
+            state.history.append(f"Bot: {jawaban}")
+            return Balasan(jawaban=jawaban)
 
         # ==================================================
         # 2️⃣ CEK APAKAH PRODUK INTERNAL / AFFILIATE
         # ==================================================
-        nodes = index.as_retriever(similarity_top_k=1).retrieve(item_name)
+        product = await run_blocking(cari_produk, item_name)
 
-        if not nodes:
+        if not product:
             order_mode = "AFFILIATE"
         else:
-            tier = nodes[0].metadata.get("tier")
+            tier = product.get("tier")
             order_mode = "EMPLOYEE" if tier == "premium" else "AFFILIATE"
 
         # ==================================================
         # 3️⃣ AFFILIATE → STOP ORDER, KASIH LINK
         # ==================================================
         if order_mode == "AFFILIATE":
-            link = nodes[0].metadata.get("affiliate_link") if nodes else None
+            link = product.get("affiliate_link") if product else None
 
             jawaban = (
                 f"Siap Kak 😊\n\n"
@@ -499,14 +1248,14 @@ async def chat_endpoint(req: QueryRequest):
                 f"- bantu pilih ukuran / fit yang aman 🙌"
             )
 
-            CHAT_HISTORY.append(f"Bot: {jawaban}")
-            return ChatResponse(jawaban=jawaban)
+            state.history.append(f"Bot: {jawaban}")
+            return Balasan(jawaban=jawaban)
 
         # ==================================================
         # 4️⃣ BELUM ADA KOMITMEN ORDER → MINTA KONFIRMASI
         # ==================================================
         if not is_order_commitment(req.pertanyaan):
-            ORDER_STATE = "AWAITING_CONFIRMATION"
+            state.order_state = "AWAITING_CONFIRMATION"
             jawaban = (
                 "Siap Kak 😊\n\n"
                 f"Kakak ingin memesan **{item_name}** ya?\n\n"
@@ -514,14 +1263,14 @@ async def chat_endpoint(req: QueryRequest):
                 "1️⃣ Ketik: **Saya pesan …** + jumlah / size\n"
                 "2️⃣ Atau langsung isi data pemesanan 🙌"
             )
-            CHAT_HISTORY.append(f"Bot: {jawaban}")
-            return ChatResponse(jawaban=jawaban)
+            state.history.append(f"Bot: {jawaban}")
+            return Balasan(jawaban=jawaban)
 
         # ==================================================
         # 5️⃣ DATA BELUM LENGKAP → MINTA NAMA & ALAMAT
         # ==================================================
         if not (qty or size) or not nama or not alamat:
-            ORDER_STATE = "COLLECTING_DATA"
+            state.order_state = "COLLECTING_DATA"
 
             jawaban = f"""
                 Siap Kak 😊  
@@ -538,19 +1287,20 @@ async def chat_endpoint(req: QueryRequest):
 
                 Silakan copas format di atas, lalu isi datanya 🙏
                 """
-            CHAT_HISTORY.append(f"Bot: {jawaban.strip()}")
-            return ChatResponse(jawaban=jawaban.strip())
+            state.history.append(f"Bot: {jawaban.strip()}")
+            return Balasan(jawaban=jawaban.strip())
 
         # ==================================================
         # 6️⃣ SEMUA DATA LENGKAP → MASUK PAYMENT
         # ==================================================
         if data.get("unit_price") == 0:
-            data["unit_price"] = ambil_harga(item_name)
+            data["unit_price"] = int(product.get("harga") or 0)
 
         total = (qty or 1) * data["unit_price"]
-        ORDER_STATE = "WAITING_PAYMENT"
+        state.order_state = "WAITING_PAYMENT"
 
-        simpan_pesanan(
+        state.order_id = simpan_pesanan(
+            req.session_id,
             nama,
             f"{item_name} (Qty {qty or 1})",
             alamat,
@@ -568,34 +1318,53 @@ async def chat_endpoint(req: QueryRequest):
             f"Pesanan akan dikirim setelah pembayaran terkonfirmasi 📦"
         )
 
-        CHAT_HISTORY.append(f"Bot: {jawaban}")
-        return ChatResponse(jawaban=jawaban)
+        state.history.append(f"Bot: {jawaban}")
+        return Balasan(jawaban=jawaban)
 
 
-    # ================= SEARCH =================
-    elif intent == "SEARCH":
-        nodes = retrieve_neutral(req.pertanyaan)
+    # ================= SEARCH / CHAT =================
+    # Jawaban hanya bergantung pada intent + pesan (tanpa history / state
+    # order) → pesan identik yang sedang diproses memakai satu jawaban
+    elif intent in ("SEARCH", "CHAT"):
+        siaran, leader = single_flight.siaran(
+            (intent, normalize(req.pertanyaan)),
+            lambda s: jawab_search_chat(s, intent, req.pertanyaan, spekulasi)
+        )
+        if not leader and spekulasi is not None:
+            spekulasi.cancel()
+            SPEKULASI["wasted"] += 1
+        return Balasan(siaran=siaran)
 
-        ctx = "\n".join(n.text for n in nodes)
+    state.history.append(f"Bot: {jawaban}")
+    return Balasan(jawaban=jawaban)
 
-        jawaban = Settings.llm.complete(
-            SEARCH_PROMPT.format(
-                question=req.pertanyaan,
-                ctx=ctx
-            )
-        ).text
+
+@app.get("/")
+def root():
+    return {"status": "Fasha AI is Online 🚀"}
 
 
-    # ================= CHAT =================
-    elif intent == "CHAT":
-        jawaban = Settings.llm.complete(ADVISOR_PROMPT.format(
-            question=req.pertanyaan
-        )).text
+@app.get("/ready")
+def ready():
+    """Readiness: 200 jika model & index sudah dimuat, 503 selama loading / gagal."""
+    return JSONResponse(STARTUP, status_code=200 if STARTUP["status"] == "ready" else 503)
 
-    CHAT_HISTORY.append(f"Bot: {jawaban}")
-    return ChatResponse(jawaban=jawaban)
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Latency per tahap & panggilan LLM per request (format Prometheus)."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
-@app.get("/")
-def root():
-    return {"status": "Fasha AI is Online 🚀"}
+
+@app.get("/stats", dependencies=[Depends(get_api_key), Depends(siap)])
+def stats():
+    return {
+        "intent_classifier": intent_classifier.stats(),
+        "answer_cache": answer_cache.stats(),
+        "embedding_cache": embed_model.stats(),
+        "speculative_retrieval": speculation_stats(),
+        "transaksi": transaction_store.stats(),
+        "prompt_tokens": prompt_meter.stats(),
+        "admission": admission.stats(),
+        "coalescing": single_flight.stats(),
+    }
@@ -1,8 +1,14 @@
 # FILE: 05_telegram_bot.py
 # TUGAS: Menghubungkan Telegram dengan API AI Render Anda
 
+import os
+import json
+import time
+import asyncio
 import logging
-import requests
+import weakref
+
+import httpx
 from telegram import Update
 from telegram.ext import ApplicationBuilder, ContextTypes, CommandHandler, MessageHandler, filters
 
@@ -18,12 +24,51 @@ API_URL = "https://api-bot-arjun.onrender.com"
 # Ingat, Telegram ini bertindak sebagai "Klien" bagi server Anda.
 API_KEY_KLIEN = "kunci_rahasia_bos" 
 
+# 4. Jeda minimal antar edit pesan saat streaming (Telegram membatasi edit)
+EDIT_INTERVAL = 1.0
+
+# 5. Koneksi ke API dipakai bersama (keep-alive) oleh semua chat
+MAX_KONEKSI = int(os.environ.get("TELEGRAM_MAX_CONNECTIONS", "32"))
+
+# 6. (Opsional) Mode webhook: isi URL publik bot, kosongkan untuk polling
+#    Contoh: https://bot-arjun.onrender.com
+WEBHOOK_URL = os.environ.get("TELEGRAM_WEBHOOK_URL", "")
+WEBHOOK_PORT = int(os.environ.get("PORT", "8443"))
+WEBHOOK_SECRET = os.environ.get("TELEGRAM_WEBHOOK_SECRET") or None
+
 # --- SETUP LOGGING ---
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     level=logging.INFO
 )
 
+# --- HTTP CLIENT BERSAMA & LOCK PER CHAT ---
+# Update dari chat berbeda diproses paralel; pesan dari chat yang sama
+# tetap berurutan agar history di server tidak tertukar.
+_chat_locks = weakref.WeakValueDictionary()
+
+def chat_lock(chat_id: int) -> asyncio.Lock:
+    lock = _chat_locks.get(chat_id)
+    if lock is None:
+        lock = asyncio.Lock()
+        _chat_locks[chat_id] = lock
+    return lock
+
+async def buka_client(application):
+    application.bot_data["http"] = httpx.AsyncClient(
+        base_url=API_URL,
+        headers={"X-API-Key": API_KEY_KLIEN},
+        timeout=httpx.Timeout(30, read=120),
+        limits=httpx.Limits(
+            max_connections=MAX_KONEKSI,
+            max_keepalive_connections=MAX_KONEKSI,
+            keepalive_expiry=60
+        ),
+    )
+
+async def tutup_client(application):
+    await application.bot_data["http"].aclose()
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Pesan sambutan saat user mengetik /start"""
     await context.bot.send_message(
@@ -38,41 +83,88 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     print(f"[TELEGRAM] Pesan dari User: {user_text}")
 
+    async with chat_lock(chat_id):
+        await balas(context, chat_id, user_text)
+
+async def balas(context: ContextTypes.DEFAULT_TYPE, chat_id: int, user_text: str):
     # Beri tahu user kalau bot sedang mengetik (biar gak dikira mati)
     await context.bot.send_chat_action(chat_id=chat_id, action="typing")
 
-    # --- MENGHUBUNGI OTAK (RENDER API) ---
+    # --- MENGHUBUNGI OTAK (RENDER API, STREAMING) ---
+    # Jawaban dikirim token demi token; pesan Telegram di-edit berkala
+    message = None
+    ai_reply = ""
+    terakhir_edit = 0.0
+
     try:
-        # Kirim surat ke API Server
-        response = requests.post(
-            f"{API_URL}/chat",
-            json={"pertanyaan": user_text},
-            headers={"X-API-Key": API_KEY_KLIEN},
-            timeout=30 # Tunggu maksimal 30 detik
-        )
-        
-        # Cek balasan
-        if response.status_code == 200:
-            ai_reply = response.json().get("jawaban", "Maaf, format error.")
-        else:
-            ai_reply = f"Error dari Server: {response.status_code} - {response.text}"
+        client = context.application.bot_data["http"]
+        async with client.stream(
+            "POST",
+            "/chat/stream",
+            json={"pertanyaan": user_text, "session_id": f"telegram-{chat_id}"},
+        ) as response:
+            if response.status_code in (429, 503):
+                # ditolak admission control server → minta user coba lagi
+                ai_reply = (
+                    "Maaf Kak, Fasha lagi ramai banget 🙏 "
+                    f"Coba kirim lagi sekitar {response.headers.get('Retry-After', '5')} detik lagi ya."
+                )
+            elif response.status_code != 200:
+                await response.aread()
+                ai_reply = f"Error dari Server: {response.status_code} - {response.text}"
+            else:
+                async for line in response.aiter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    data = json.loads(line[len("data: "):])
+                    if data.get("error"):
+                        # ditolak admission control setelah stream dimulai
+                        ai_reply = (
+                            "Maaf Kak, Fasha lagi ramai banget 🙏 "
+                            f"Coba kirim lagi sekitar {data.get('retry_after', 5)} detik lagi ya."
+                        )
+                        break
+                    delta = data.get("delta")
+                    if not delta:
+                        continue
+                    ai_reply += delta
+
+                    sekarang = time.monotonic()
+                    if sekarang - terakhir_edit < EDIT_INTERVAL:
+                        continue
+                    terakhir_edit = sekarang
+                    if message is None:
+                        message = await context.bot.send_message(chat_id=chat_id, text=ai_reply)
+                    else:
+                        message = await message.edit_text(ai_reply)
+
+        if not ai_reply:
+            ai_reply = "Maaf, format error."
 
     except Exception as e:
         ai_reply = f"Gagal menghubungi server: {e}"
         print(f"[ERROR] {e}")
 
-    # --- KIRIM JAWABAN KE TELEGRAM ---
-    await context.bot.send_message(
-        chat_id=chat_id,
-        text=ai_reply
-    )
+    # --- KIRIM / FINALISASI JAWABAN KE TELEGRAM ---
+    if message is None:
+        await context.bot.send_message(chat_id=chat_id, text=ai_reply)
+    elif message.text != ai_reply:
+        await message.edit_text(ai_reply)
 
 if __name__ == '__main__':
     print("--- BOT TELEGRAM BERJALAN ---")
     print("Tekan Ctrl+C untuk berhenti.")
     
     # Membangun Aplikasi Bot
-    application = ApplicationBuilder().token(TELEGRAM_TOKEN).build()
+    # concurrent_updates → chat lain tidak menunggu balasan yang lambat
+    application = (
+        ApplicationBuilder()
+        .token(TELEGRAM_TOKEN)
+        .concurrent_updates(True)
+        .post_init(buka_client)
+        .post_shutdown(tutup_client)
+        .build()
+    )
     
     # Menambahkan Handler
     start_handler = CommandHandler('start', start)
@@ -81,5 +173,15 @@ if __name__ == '__main__':
     application.add_handler(start_handler)
     application.add_handler(msg_handler)
     
-    # Jalankan Bot (Polling Mode)
-    application.run_polling()
\ No newline at end of file
+    if WEBHOOK_URL:
+        # Jalankan Bot (Webhook Mode): Telegram langsung push update ke sini
+        application.run_webhook(
+            listen="0.0.0.0",
+            port=WEBHOOK_PORT,
+            url_path=TELEGRAM_TOKEN,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{TELEGRAM_TOKEN}",
+            secret_token=WEBHOOK_SECRET,
+        )
+    else:
+        # Jalankan Bot (Polling Mode)
+        application.run_polling()
\ No newline at end of file
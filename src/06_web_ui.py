@@ -6,6 +6,9 @@
 # - Affiliator cerdas untuk produk non-premium
 # - Advisor fashion jika user hanya bertanya
 
+import json
+import uuid
+
 import streamlit as st
 import requests
 
@@ -70,6 +73,11 @@ st.info(
 # ==============================
 # INISIALISASI CHAT MEMORY
 # ==============================
+# Satu session_id per tab browser agar history & status order di server
+# tidak tercampur dengan pengunjung lain
+if "session_id" not in st.session_state:
+    st.session_state.session_id = f"web-{uuid.uuid4().hex}"
+
 if "messages" not in st.session_state:
     st.session_state.messages = [
         {
@@ -110,20 +118,45 @@ if prompt := st.chat_input(
         placeholder.markdown("Fasha sedang mengetik... 🤍")
 
         try:
-            payload = {"pertanyaan": prompt}
+            payload = {
+                "pertanyaan": prompt,
+                "session_id": st.session_state.session_id
+            }
             headers = {"X-API-Key": API_KEY}
 
+            # Streaming (SSE): jawaban muncul token demi token
             response = requests.post(
-                f"{API_URL}/chat",
+                f"{API_URL}/chat/stream",
                 json=payload,
                 headers=headers,
-                timeout=120
+                stream=True,
+                timeout=(10, 120)
             )
 
             if response.status_code == 200:
-                ai_answer = response.json().get(
-                    "jawaban",
-                    "Maaf Kak, ada sedikit kendala di sistem."
+                ai_answer = ""
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data: "):
+                        continue
+                    data = json.loads(line[len("data: "):])
+                    if data.get("error"):
+                        # ditolak admission control setelah stream dimulai
+                        ai_answer = (
+                            "⏳ Fasha lagi ramai, coba kirim lagi "
+                            f"{data.get('retry_after', 5)} detik lagi ya Kak."
+                        )
+                        break
+                    delta = data.get("delta")
+                    if delta:
+                        ai_answer += delta
+                        placeholder.markdown(ai_answer + "▌")
+
+                if not ai_answer:
+                    ai_answer = "Maaf Kak, ada sedikit kendala di sistem."
+            elif response.status_code in (429, 503):
+                ai_answer = (
+                    "⏳ Fasha lagi ramai, coba kirim lagi "
+                    f"{response.headers.get('Retry-After', '5')} detik lagi ya Kak."
                 )
             else:
                 ai_answer = (
@@ -0,0 +1,71 @@
+# FILE: 07_bench_concurrency.py
+# TUGAS: Mengukur throughput /chat terhadap jumlah klien bersamaan
+#
+# Jalankan server dulu:
+#   uvicorn src.03_api_server:app --port 8000
+# Lalu:
+#   python src/07_bench_concurrency.py
+#
+# Kalau event loop tidak terblokir, req/s harus naik seiring jumlah klien
+# (sampai batas FASHA_MAX_CONCURRENCY di server).
+# Request yang ditolak admission control (429 / 503) diulang setelah
+# Retry-After; latency yang dicatat sudah termasuk waktu tunggu tersebut.
+
+import os
+import time
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# --- KONFIGURASI ---
+API_URL = os.environ.get("FASHA_API_URL", "http://127.0.0.1:8000")
+API_KEY = os.environ.get("FASHA_API_KEY", "kunci_rahasia_bos")
+LEVEL_KONKURENSI = [1, 2, 4, 8, 16]
+REQUEST_PER_KLIEN = 3
+MAKS_ULANG = 10
+
+PERTANYAAN = [
+    "Ada outfit yang cocok buat main padel?",
+    "Apa bedanya katun dan linen?",
+    "Ada baju renang yang syar'i?",
+    "Budget 500 ribu, ada rekomendasi?",
+]
+
+
+def kirim(i: int) -> float:
+    mulai = time.perf_counter()
+    for _ in range(MAKS_ULANG):
+        response = requests.post(
+            f"{API_URL}/chat",
+            json={
+                "pertanyaan": PERTANYAAN[i % len(PERTANYAAN)],
+                # session berbeda per request: session yang sama diproses berurutan
+                "session_id": f"bench-{i}"
+            },
+            headers={"X-API-Key": API_KEY},
+            timeout=120
+        )
+        if response.status_code not in (429, 503):
+            break
+        time.sleep(float(response.headers.get("Retry-After", "1")))
+    response.raise_for_status()
+    return time.perf_counter() - mulai
+
+
+def jalankan_level(jumlah_klien: int):
+    total = jumlah_klien * REQUEST_PER_KLIEN
+    mulai = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=jumlah_klien) as pool:
+        latensi = list(pool.map(kirim, range(total)))
+    durasi = time.perf_counter() - mulai
+    return total / durasi, statistics.median(latensi)
+
+
+if __name__ == "__main__":
+    print(f"--- Benchmark konkurensi ke {API_URL} ---")
+    print(f"{'klien':>6} | {'req/s':>8} | {'p50 (s)':>8}")
+    print("-" * 30)
+    for n in LEVEL_KONKURENSI:
+        rps, p50 = jalankan_level(n)
+        print(f"{n:>6} | {rps:>8.2f} | {p50:>8.2f}")
@@ -0,0 +1,61 @@
+# FILE: 08_train_intent.py
+# TUGAS: Melatih model char n-gram untuk fast-path intent classifier
+#
+# Data latih = keputusan llm_detect_intent yang dicatat server ke
+# FASHA_INTENT_LOG (opt-in: set di server, mis. intent_decisions.jsonl,
+# lalu jalankan script ini dengan nilai yang sama).
+# Hasil disimpan ke FASHA_INTENT_MODEL (default: intent_model.json),
+# otomatis dimuat server saat start.
+
+import os
+import sys
+import json
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.intent_classifier import NgramNaiveBayes, load_decisions
+
+# --- KONFIGURASI ---
+FILE_LOG = os.environ.get("FASHA_INTENT_LOG", "intent_decisions.jsonl")
+FILE_MODEL = os.environ.get("FASHA_INTENT_MODEL", "intent_model.json")
+THRESHOLD = float(os.environ.get("FASHA_INTENT_THRESHOLD", "0.85"))
+MIN_DATA = 50
+
+
+def evaluasi(texts, labels):
+    data = list(zip(texts, labels))
+    random.Random(42).shuffle(data)
+    split = int(len(data) * 0.8)
+    train, test = data[:split], data[split:]
+
+    model = NgramNaiveBayes().fit(*zip(*train))
+
+    yakin = benar = 0
+    for text, label in test:
+        proba = model.predict_proba(text)
+        pred = max(proba, key=proba.get)
+        if proba[pred] >= THRESHOLD:
+            yakin += 1
+            benar += pred == label
+
+    print(f"📊 Data uji           : {len(test)}")
+    print(f"⚡ Coverage fast-path : {yakin / len(test):.1%} (threshold {THRESHOLD})")
+    if yakin:
+        print(f"🎯 Akurasi saat yakin : {benar / yakin:.1%}")
+
+
+if __name__ == "__main__":
+    texts, labels = load_decisions(FILE_LOG)
+    print(f"🚀 Ditemukan {len(texts)} keputusan intent di {FILE_LOG}")
+
+    if len(texts) < MIN_DATA:
+        print(f"❌ Minimal {MIN_DATA} data untuk melatih model. Kumpulkan log dulu.")
+        sys.exit(1)
+
+    evaluasi(texts, labels)
+
+    model = NgramNaiveBayes().fit(texts, labels)
+    with open(FILE_MODEL, "w", encoding="utf-8") as f:
+        json.dump(model.to_dict(), f, ensure_ascii=False)
+
+    print(f"✅ Model disimpan ke {FILE_MODEL}")
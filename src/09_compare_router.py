@@ -0,0 +1,74 @@
+# FILE: 09_compare_router.py
+# TUGAS: Membandingkan router two_call vs combined (latency & akurasi)
+#
+# two_call : llm_detect_intent → (jika ORDER) ekstrak_order   = 1–2 call LLM
+# combined : llm_route (intent + mode + data order sekaligus) = 1 call LLM
+#
+# Jalankan dari root project (butuh OPENAI_API_KEY & chroma_db):
+#   python src/09_compare_router.py
+
+import os
+import sys
+import time
+import importlib
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+server = importlib.import_module("src.03_api_server")
+server.inisialisasi()  # tanpa uvicorn → lifespan tidak jalan, muat manual
+
+# (pesan, history, intent yang benar, item yang benar jika ORDER)
+DATASET = [
+    ("Saya mau cari baju batik buat kondangan", "", "SEARCH", None),
+    ("Ada outfit yang cocok buat main padel?", "", "SEARCH", None),
+    ("Budget 500 ribu, ada rekomendasi?", "", "SEARCH", None),
+    ("Ada baju renang yang syar'i?", "", "SEARCH", None),
+    ("Saya pesan Aylee Set ukuran M", "", "ORDER", "aylee set"),
+    ("Ambil hoodie Adrea warna hitam size L", "", "ORDER", "adrea"),
+    ("Jadi beli Freya Legging 2 pcs, kirim ke Jl. Merdeka 10 a.n. Sinta", "", "ORDER", "freya"),
+    ("Saya mau checkout yang ini", "User: Ada hoodie Adrea?\nBot: Ada Kak, Adrea Hoodie Sporty.", "ORDER", "adrea"),
+    ("Menurut kamu warna apa yang cocok buat kulit sawo matang?", "", "CHAT", None),
+    ("Apa bedanya katun dan linen?", "", "CHAT", None),
+    ("Baju syar'i itu seperti apa?", "", "CHAT", None),
+    ("Cuaca panas enaknya pakai apa?", "", "CHAT", None),
+]
+
+
+def two_call(pesan, history):
+    intent = server.llm_detect_intent(pesan)
+    calls = 1
+    data = {}
+    if intent == "ORDER":
+        data = server.ekstrak_order(pesan, history)
+        calls += 1
+    return intent, data, calls
+
+
+def combined(pesan, history):
+    data = server.llm_route(pesan, history)
+    return data.get("intent"), data, 1
+
+
+def evaluasi(nama, fungsi):
+    latensi, benar_intent, benar_item, total_order, total_call = [], 0, 0, 0, 0
+    for pesan, history, intent_benar, item_benar in DATASET:
+        mulai = time.perf_counter()
+        intent, data, calls = fungsi(pesan, history)
+        latensi.append(time.perf_counter() - mulai)
+        total_call += calls
+        benar_intent += intent == intent_benar
+        if item_benar:
+            total_order += 1
+            benar_item += item_benar in (data.get("item") or "").lower()
+
+    print(f"\n=== {nama} ===")
+    print(f"⏱️  Latency rata-rata : {statistics.mean(latensi):.2f} s (p50 {statistics.median(latensi):.2f} s)")
+    print(f"📞 Total call LLM    : {total_call}")
+    print(f"🎯 Akurasi intent    : {benar_intent}/{len(DATASET)}")
+    print(f"🛒 Item ORDER benar  : {benar_item}/{total_order}")
+
+
+if __name__ == "__main__":
+    print("--- Perbandingan Router Intent ---")
+    evaluasi("two_call", two_call)
+    evaluasi("combined", combined)
@@ -0,0 +1,95 @@
+# FILE: 10_bench_retrieval.py
+# TUGAS: Benchmark retrieval llama_index + Chroma vs NumpyVectorEngine
+#
+# Query = embedding produk yang sudah tersimpan di chroma_db (tanpa API call),
+# dijalankan tanpa filter, dengan filter tier, dan dengan filter gender + harga.
+# Dilaporkan latency rata-rata / p95 dan overlap@k terhadap hasil Chroma.
+#
+# Jalankan dari root project:
+#   python src/10_bench_retrieval.py [jumlah_query] [top_k]
+
+import os
+import sys
+import time
+import statistics
+
+import chromadb
+from llama_index.core import VectorStoreIndex, QueryBundle
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.vector_stores import MetadataFilter, MetadataFilters, FilterOperator
+from llama_index.vector_stores.chroma import ChromaVectorStore
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.vector_engine import NumpyVectorEngine
+
+DB_PATH = "./chroma_db"
+JUMLAH_QUERY = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+TOP_K = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+SKENARIO = [
+    ("tanpa filter", {}),
+    ("tier=premium", {"tier": "premium"}),
+    ("gender=wanita, harga<=500rb", {"gender": "wanita", "max_harga": 500_000}),
+]
+
+
+def chroma_filters(tier=None, gender=None, max_harga=None):
+    filters = []
+    for key, value in (("tier", tier), ("gender", gender)):
+        if value:
+            filters.append(MetadataFilter(key=key, value=value, operator=FilterOperator.EQ))
+    if max_harga is not None:
+        filters.append(MetadataFilter(key="harga", value=max_harga, operator=FilterOperator.LTE))
+    return MetadataFilters(filters=filters) if filters else None
+
+
+def p95(values):
+    return sorted(values)[int(0.95 * (len(values) - 1))]
+
+
+def ukur(fungsi, queries):
+    latensi, hasil = [], []
+    for q in queries:
+        mulai = time.perf_counter()
+        nodes = fungsi(q)
+        latensi.append(time.perf_counter() - mulai)
+        hasil.append([n.node.node_id for n in nodes])
+    return latensi, hasil
+
+
+if __name__ == "__main__":
+    db = chromadb.PersistentClient(path=DB_PATH)
+    collection = db.get_or_create_collection("fashion_store")
+    data = collection.get(include=["embeddings"], limit=JUMLAH_QUERY)
+    queries = [list(map(float, e)) for e in data["embeddings"]]
+    if not queries:
+        sys.exit("❌ Koleksi kosong, jalankan 01_build_index.py dulu")
+
+    # embed_model tidak dipakai (embedding query sudah ada), cukup dummy
+    index = VectorStoreIndex.from_vector_store(
+        ChromaVectorStore(chroma_collection=collection),
+        embed_model=MockEmbedding(embed_dim=len(queries[0]))
+    )
+
+    mulai = time.perf_counter()
+    engine = NumpyVectorEngine(collection, db_path=DB_PATH)
+    print(f"--- Benchmark Retrieval ({len(engine)} produk, {len(queries)} query, top_k={TOP_K}) ---")
+    print(f"📦 Load NumpyVectorEngine: {1000 * (time.perf_counter() - mulai):.1f} ms")
+
+    for nama, facets in SKENARIO:
+        retriever = index.as_retriever(similarity_top_k=TOP_K, filters=chroma_filters(**facets))
+        lat_chroma, hasil_chroma = ukur(
+            lambda q: retriever.retrieve(QueryBundle("", embedding=q)), queries
+        )
+        lat_numpy, hasil_numpy = ukur(
+            lambda q: engine.search(q, top_k=TOP_K, **facets), queries
+        )
+        overlap = statistics.mean(
+            len(set(a) & set(b)) / max(len(a), 1)
+            for a, b in zip(hasil_chroma, hasil_numpy)
+        )
+
+        print(f"\n=== {nama} ===")
+        print(f"🐢 chroma : rata-rata {1000 * statistics.mean(lat_chroma):.2f} ms | p95 {1000 * p95(lat_chroma):.2f} ms")
+        print(f"⚡ numpy  : rata-rata {1000 * statistics.mean(lat_numpy):.2f} ms | p95 {1000 * p95(lat_numpy):.2f} ms")
+        print(f"🎯 overlap@{TOP_K}: {overlap:.2%}")
@@ -0,0 +1,86 @@
+# FILE: 11_bench_hybrid.py
+# TUGAS: Membandingkan retrieval vector saja vs hybrid (BM25 + vector)
+#
+# vector : embedding query → retrieve_neutral
+# hybrid : exact match nama produk (tanpa embedding), jika tidak ada
+#          → embedding → retrieve_hybrid (RRF vector + BM25)
+# Dilaporkan recall@k (produk yang diharapkan masuk top-k), latency
+# rata-rata / p95, dan jumlah panggilan embedding.
+#
+# Jalankan dari root project (butuh OPENAI_API_KEY & chroma_db):
+#   python src/11_bench_hybrid.py
+
+import os
+import sys
+import time
+import importlib
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+server = importlib.import_module("src.03_api_server")
+server.inisialisasi()  # tanpa uvicorn → lifespan tidak jalan, muat manual
+
+from llama_index.core import Settings, QueryBundle
+
+TOP_K = 5
+
+# (query, potongan nama produk yang WAJIB muncul di top-k)
+DATASET = [
+    ("Aylee Set Sporty Syar'i", ["aylee set"]),
+    ("Adrea Hoodie Sporty", ["adrea hoodie"]),
+    ("ada Freya Legging?", ["freya legging"]),
+    ("Francia Hijab Instan", ["francia hijab"]),
+    ("Kemeja Batik Slim Fit", ["kemeja batik"]),
+    ("baju kondangan pria", ["kemeja batik", "celana chino", "sepatu loafers"]),
+    ("perlengkapan padel", ["kaos polo padel", "celana pendek padel", "sepatu padel", "tas raket padel"]),
+    ("baju renang muslimah", ["flavia muslimah swimwear"]),
+    ("hijab sport instan", ["francia hijab", "charlotte hijab", "bahira series"]),
+    ("jas hujan", ["marvella raincoat"]),
+    ("outfit buat brunch", ["dress midi floral", "blouse linen casual"]),
+    ("tas buat kerja", ["tas tote bag"]),
+]
+
+
+def p95(values):
+    return sorted(values)[int(0.95 * (len(values) - 1))]
+
+
+def vector_saja(query):
+    embedding = Settings.embed_model.get_query_embedding(query)
+    return server.retrieve_neutral(QueryBundle(query, embedding=embedding), top_k=TOP_K), 1
+
+
+def hybrid(query):
+    nodes = server.cari_nama_persis(query)
+    if nodes:
+        return nodes, 0
+    embedding = Settings.embed_model.get_query_embedding(query)
+    return server.retrieve_hybrid(QueryBundle(query, embedding=embedding), top_k=TOP_K), 1
+
+
+def evaluasi(nama, fungsi):
+    latensi, recall, total_embed = [], [], 0
+    for query, harapan in DATASET:
+        mulai = time.perf_counter()
+        nodes, embed_calls = fungsi(query)
+        latensi.append(time.perf_counter() - mulai)
+        total_embed += embed_calls
+
+        nama_hasil = " | ".join(n.metadata.get("nama_produk", "").lower() for n in nodes)
+        recall.append(sum(h in nama_hasil for h in harapan) / len(harapan))
+
+    print(f"\n=== {nama} ===")
+    print(f"⏱️  Latency rata-rata : {1000 * statistics.mean(latensi):.1f} ms (p95 {1000 * p95(latensi):.1f} ms)")
+    print(f"🧠 Panggilan embedding: {total_embed}/{len(DATASET)}")
+    print(f"🎯 Recall@{TOP_K}        : {statistics.mean(recall):.2%}")
+
+
+if __name__ == "__main__":
+    if server.lexical_index is None:
+        sys.exit("❌ Set FASHA_HYBRID_RETRIEVAL=1 untuk membandingkan")
+    print(f"--- Perbandingan Retrieval ({len(server.lexical_index)} produk) ---")
+    # embedding cache dipanaskan dulu agar latency vector tidak didominasi API
+    for query, _ in DATASET:
+        Settings.embed_model.get_query_embedding(query)
+    evaluasi("vector", vector_saja)
+    evaluasi("hybrid", hybrid)
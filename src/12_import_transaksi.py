@@ -0,0 +1,25 @@
+# FILE: 12_import_transaksi.py
+# TUGAS: Import data_transaksi.csv lama ke transaction store SQLite (sekali jalan)
+#
+# Baris yang sudah pernah di-import dilewati (order_id = csv-<nomor baris>).
+#
+# Jalankan dari root project:
+#   python src/12_import_transaksi.py [data_transaksi.csv]
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.transaction_store import TransactionStore
+
+FILE_CSV = sys.argv[1] if len(sys.argv) > 1 else "data_transaksi.csv"
+
+if __name__ == "__main__":
+    if not os.path.exists(FILE_CSV):
+        sys.exit(f"❌ File {FILE_CSV} tidak ditemukan!")
+
+    store = TransactionStore.from_env()
+    jumlah = store.import_csv(FILE_CSV)
+    print(f"✅ {jumlah} transaksi di-import dari {FILE_CSV} ke {store.path}")
+    print(f"📊 Per status: {store.stats()['per_status']}")
+    store.close()
@@ -0,0 +1,116 @@
+# FILE: 13_load_test.py
+# TUGAS: Load test /chat dengan skenario multi-turn SEARCH → ORDER → pembayaran
+#
+# Jalankan server dengan model OFFLINE (tanpa OpenAI, latency buatan):
+#   FASHA_OFFLINE_MODELS=1 FASHA_OFFLINE_LLM_LATENCY=0.5 \
+#       uvicorn src.03_api_server:app --port 8000
+# Lalu:
+#   python src/13_load_test.py [jumlah_user] [iterasi_per_user]
+#
+# Setiap user virtual menjalankan satu skenario berurutan dengan session_id
+# sendiri (pesan dalam satu session memang diproses berurutan oleh server).
+# Dilaporkan p50/p95/p99 latency per langkah & total, serta req/s.
+# Request yang ditolak admission control (429 / 503) diulang setelah
+# Retry-After (latency langkah termasuk waktu tunggu) dan jumlahnya
+# dilaporkan. Langkah yang tetap gagal menghentikan skenario itu, karena
+# langkah berikutnya bergantung pada state order session tersebut.
+
+import os
+import sys
+import time
+import asyncio
+import statistics
+from collections import Counter, defaultdict
+
+import httpx
+
+# --- KONFIGURASI ---
+API_URL = os.environ.get("FASHA_API_URL", "http://127.0.0.1:8000")
+API_KEY = os.environ.get("FASHA_API_KEY", "kunci_rahasia_bos")
+JUMLAH_USER = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+ITERASI = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+MAKS_ULANG = 10
+
+# (label langkah, pesan)
+SKENARIO = [
+    [
+        ("SEARCH", "Ada outfit yang cocok buat main padel?"),
+        ("ORDER", "Saya pesan Aylee Set ukuran M"),
+        ("ORDER_DATA", "Nama: Sinta, alamat: Jl. Merdeka 10 Jakarta, qty 1"),
+        ("PAYMENT", "Sudah transfer kak"),
+    ],
+    [
+        ("CHAT", "Apa bedanya katun dan linen?"),
+        ("SEARCH", "Budget 500 ribu, ada rekomendasi hoodie?"),
+        ("ORDER", "Jadi beli Adrea Hoodie Sporty size L"),
+        ("ORDER_DATA", "Nama: Budi, alamat: Jl. Sudirman 5 Bandung, qty 2"),
+        ("PAYMENT", "Udah bayar ya"),
+    ],
+    [
+        ("SEARCH", "Lagi cari baju renang yang syar'i"),
+        ("CHAT", "Cuaca panas enaknya pakai bahan apa?"),
+        ("SEARCH", "Rekomendasi hijab instan buat olahraga"),
+    ],
+]
+
+
+def persentil(values, p):
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[p - 1]
+
+
+async def user_virtual(client, nomor: int, latensi: dict, gagal: list, ditolak: Counter):
+    for iterasi in range(ITERASI):
+        skenario = SKENARIO[(nomor + iterasi) % len(SKENARIO)]
+        session_id = f"load-{nomor}-{iterasi}"
+        for label, pesan in skenario:
+            mulai = time.perf_counter()
+            try:
+                for _ in range(MAKS_ULANG):
+                    response = await client.post(
+                        "/chat", json={"pertanyaan": pesan, "session_id": session_id}
+                    )
+                    if response.status_code not in (429, 503):
+                        break
+                    ditolak[response.status_code] += 1
+                    await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                gagal.append(f"{label}: {e}")
+                break
+            latensi[label].append(time.perf_counter() - mulai)
+
+
+async def main():
+    latensi, gagal, ditolak = defaultdict(list), [], Counter()
+    async with httpx.AsyncClient(
+        base_url=API_URL,
+        headers={"X-API-Key": API_KEY},
+        timeout=httpx.Timeout(120),
+        limits=httpx.Limits(max_connections=JUMLAH_USER)
+    ) as client:
+        mulai = time.perf_counter()
+        await asyncio.gather(*(
+            user_virtual(client, i, latensi, gagal, ditolak) for i in range(JUMLAH_USER)
+        ))
+        durasi = time.perf_counter() - mulai
+
+    semua = [v for values in latensi.values() for v in values]
+    print(f"\n{'langkah':<12} | {'n':>5} | {'p50 (s)':>8} | {'p95 (s)':>8} | {'p99 (s)':>8}")
+    print("-" * 54)
+    for label, values in sorted(latensi.items()) + [("TOTAL", semua)]:
+        print(
+            f"{label:<12} | {len(values):>5} | {persentil(values, 50):>8.3f} | "
+            f"{persentil(values, 95):>8.3f} | {persentil(values, 99):>8.3f}"
+        )
+    print(f"\n🚀 Throughput : {len(semua) / durasi:.2f} req/s ({len(semua)} request dalam {durasi:.1f} s)")
+    if ditolak:
+        print(f"🚦 Diulang    : {dict(ditolak)} (429 = rate limit, 503 = server penuh)")
+    if gagal:
+        print(f"❌ Gagal      : {len(gagal)} (contoh: {gagal[0]})")
+
+
+if __name__ == "__main__":
+    print(f"--- Load test {API_URL} | {JUMLAH_USER} user x {ITERASI} skenario ---")
+    asyncio.run(main())
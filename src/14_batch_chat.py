@@ -0,0 +1,66 @@
+# FILE: 14_batch_chat.py
+# TUGAS: Kirim backlog pesan (inbox marketplace / evaluation set) ke /chat/batch
+#
+# Jalankan dari root project (server sudah jalan):
+#   python src/14_batch_chat.py pesan.csv [hasil.csv]
+#
+# pesan.csv minimal berisi kolom: session_id, pertanyaan
+# Urutan baris dipertahankan; pesan dengan session_id yang sama diproses
+# berurutan oleh server. Hasil ditulis dengan kolom tambahan jawaban & error.
+
+import os
+import sys
+import csv
+import time
+
+import httpx
+
+# --- KONFIGURASI ---
+API_URL = os.environ.get("FASHA_API_URL", "http://127.0.0.1:8000")
+API_KEY = os.environ.get("FASHA_API_KEY", "kunci_rahasia_bos")
+UKURAN_BATCH = int(os.environ.get("FASHA_BATCH_SIZE", "200"))
+
+
+def kirim_batch(client, rows: list) -> list:
+    items = [{"session_id": r["session_id"], "pertanyaan": r["pertanyaan"]} for r in rows]
+    while True:
+        response = client.post("/chat/batch", json={"items": items})
+        if response.status_code in (429, 503):
+            # ditolak admission control → tunggu sesuai Retry-After lalu ulang
+            time.sleep(float(response.headers.get("Retry-After", "5")))
+            continue
+        response.raise_for_status()
+        return response.json()["hasil"]
+
+
+def main(sumber: str, tujuan: str):
+    with open(sumber, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    print(f"--- {len(rows)} pesan dari {sumber} → {API_URL}/chat/batch ---")
+
+    mulai = time.perf_counter()
+    gagal = 0
+    with httpx.Client(base_url=API_URL, headers={"X-API-Key": API_KEY}, timeout=httpx.Timeout(600)) as client:
+        for i in range(0, len(rows), UKURAN_BATCH):
+            chunk = rows[i:i + UKURAN_BATCH]
+            for row, hasil in zip(chunk, kirim_batch(client, chunk)):
+                row["jawaban"] = hasil["jawaban"] or ""
+                row["error"] = hasil["error"] or ""
+                gagal += bool(hasil["error"])
+            print(f"📦 {min(i + UKURAN_BATCH, len(rows))}/{len(rows)} pesan selesai")
+
+    with open(tujuan, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()) if rows else ["session_id", "pertanyaan"])
+        writer.writeheader()
+        writer.writerows(rows)
+
+    durasi = time.perf_counter() - mulai
+    print(f"✅ Selesai dalam {durasi:.1f} s ({len(rows) / durasi:.1f} pesan/s), error: {gagal}")
+    print(f"💾 Hasil: {tujuan}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Pemakaian: python src/14_batch_chat.py pesan.csv [hasil.csv]")
+        sys.exit(1)
+    main(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else "hasil_batch.csv")
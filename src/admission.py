@@ -0,0 +1,261 @@
+# ======================================================
+# FILE: admission.py
+# FASHA AI — Admission Control & Load Shedding per API Key
+# ======================================================
+# Satu klien yang berisik (mis. bot Telegram saat promo) tidak boleh
+# menumpuk pekerjaan LLM tanpa batas sampai klien lain ikut timeout.
+#   - Token bucket per API key  → 429 + Retry-After kalau melebihi rate
+#                                 (opt-in: tanpa FASHA_RATE_LIMIT / FASHA_RATE_LIMITS
+#                                 tidak ada batas rate, karena bot Telegram & web UI
+#                                 masing-masing memakai SATU key untuk semua user)
+#   - Slot in-flight terbatas   → request yang jalan bersamaan dibatasi,
+#                                 sisanya antre di antrean yang juga terbatas
+#   - Load shedding             → 503 + Retry-After secepatnya kalau antrean
+#                                 penuh atau estimasi waktu tunggu melewati
+#                                 target latency (tidak menunggu sampai timeout)
+#   - Counter pemakaian per key → ditampilkan di /stats
+#   - Tiket tanpa slot          → pesan identik yang sedang dikerjakan request
+#                                 lain (calon follower single-flight) tidak
+#                                 memakai slot; slot baru diambil (ambil_slot)
+#                                 jika ternyata request itu mengerjakan LLM sendiri
+#
+# Batas berlaku per worker uvicorn.
+
+import os
+import time
+import asyncio
+import threading
+from dataclasses import dataclass, field
+
+
+class Ditolak(Exception):
+    """Request ditolak admission control (diubah jadi HTTP 429 / 503 di server)."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+# ======================================================
+# 1. TOKEN BUCKET
+# ======================================================
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate      # token per detik
+        self.burst = burst    # kapasitas maksimal
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def ambil(self) -> float:
+        """Ambil 1 token → 0 kalau boleh, selain itu detik sampai token tersedia."""
+        sekarang = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (sekarang - self.updated) * self.rate)
+        self.updated = sekarang
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+
+@dataclass
+class Pemakaian:
+    diterima: int = 0
+    ditolak_rate: int = 0
+    ditolak_overload: int = 0
+    tanpa_slot: int = 0
+    in_flight: int = 0
+    durasi_total: float = 0.0
+    bucket: TokenBucket = field(default=None, repr=False)
+
+
+@dataclass
+class Tiket:
+    api_key: str
+    mulai: float
+    ukur: bool = True
+    slot: bool = True          # memegang slot in-flight?
+    antre: float = None        # batas tunggu saat ambil_slot (None = tolak langsung)
+    selesai: bool = False
+
+
+def parse_limits(spec: str) -> dict:
+    """"key:rate:burst,key2:rate:burst" → {key: (rate, burst)}."""
+    hasil = {}
+    for bagian in filter(None, (s.strip() for s in spec.split(","))):
+        key, rate, burst = bagian.rsplit(":", 2)
+        hasil[key] = (float(rate), float(burst))
+    return hasil
+
+
+def samarkan(api_key: str) -> str:
+    return api_key[:4] + "…" if len(api_key) > 4 else "…"
+
+
+# ======================================================
+# 2. ADMISSION CONTROLLER
+# ======================================================
+class AdmissionController:
+    def __init__(
+        self,
+        rate: float = None,
+        burst: float = None,
+        limits: dict = None,
+        max_inflight: int = 16,
+        max_queue: int = 64,
+        latency_target: float = 10.0,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.limits = limits or {}
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.latency_target = latency_target
+
+        self._lock = threading.Lock()
+        self._usage = {}
+        self._slot = asyncio.Semaphore(max_inflight)
+        self._menunggu = 0
+        # rata-rata bergerak (EWMA) durasi satu request → estimasi waktu tunggu
+        self._durasi_ewma = 1.0
+
+    @classmethod
+    def from_env(cls, max_inflight: int = 16):
+        rate = os.environ.get("FASHA_RATE_LIMIT", "")
+        burst = os.environ.get("FASHA_RATE_BURST", "")
+        return cls(
+            rate=float(rate) if rate else None,
+            burst=float(burst) if burst else None,
+            limits=parse_limits(os.environ.get("FASHA_RATE_LIMITS", "")),
+            max_inflight=int(os.environ.get("FASHA_MAX_INFLIGHT", str(max_inflight))),
+            max_queue=int(os.environ.get("FASHA_MAX_QUEUE", "64")),
+            latency_target=float(os.environ.get("FASHA_LATENCY_TARGET", "10")),
+        )
+
+    def _pemakaian(self, api_key: str) -> Pemakaian:
+        usage = self._usage.get(api_key)
+        if usage is None:
+            rate, burst = self.limits.get(api_key, (self.rate, self.burst))
+            bucket = None
+            if rate is not None:
+                # burst default = rate per detik (minimal 1 request)
+                bucket = TokenBucket(rate, burst if burst is not None else max(rate, 1.0))
+            usage = self._usage[api_key] = Pemakaian(bucket=bucket)
+        return usage
+
+    def estimasi_tunggu(self) -> float:
+        """Perkiraan detik menunggu slot untuk request yang masuk sekarang."""
+        return (self._menunggu + 1) / self.max_inflight * self._durasi_ewma
+
+    async def masuk(self, api_key: str, ukur: bool = True, slot: bool = True) -> Tiket:
+        """Cek rate & minta slot → Tiket untuk keluar(). Raise Ditolak kalau harus ditolak.
+
+        ukur=False: durasi tidak masuk estimasi waktu tunggu (stream yang
+        kecepatannya ditentukan klien, item batch).
+        slot=False: hanya rate limit, slot diambil nanti lewat ambil_slot().
+        """
+        with self._lock:
+            usage = self._pemakaian(api_key)
+            tunggu = usage.bucket.ambil() if usage.bucket is not None else 0.0
+            if tunggu:
+                usage.ditolak_rate += 1
+                raise Ditolak(429, "Terlalu banyak request untuk API key ini", tunggu)
+
+        if slot:
+            await self._tunggu_slot(usage)
+
+        with self._lock:
+            usage.diterima += 1
+            usage.in_flight += 1
+            if not slot:
+                usage.tanpa_slot += 1
+        return Tiket(api_key, time.perf_counter(), ukur=ukur, slot=slot)
+
+    async def _tunggu_slot(self, usage: Pemakaian):
+        with self._lock:
+            if self._slot.locked():
+                estimasi = self.estimasi_tunggu()
+                if self._menunggu >= self.max_queue or estimasi > self.latency_target:
+                    usage.ditolak_overload += 1
+                    raise Ditolak(503, "Server sedang penuh, coba lagi sebentar", estimasi)
+            self._menunggu += 1
+
+        try:
+            await asyncio.wait_for(self._slot.acquire(), timeout=self.latency_target)
+        except asyncio.TimeoutError:
+            with self._lock:
+                usage.ditolak_overload += 1
+            raise Ditolak(503, "Server sedang penuh, coba lagi sebentar", self._durasi_ewma)
+        finally:
+            with self._lock:
+                self._menunggu -= 1
+
+    async def ambil_slot(self, tiket: Tiket):
+        """Tiket tanpa slot ternyata butuh pekerjaan LLM sendiri → ambil slot sekarang."""
+        if tiket.slot:
+            return
+        usage = self._usage[tiket.api_key]
+        deadline = time.monotonic() + (tiket.antre or 0.0)
+        while True:
+            try:
+                await self._tunggu_slot(usage)
+                break
+            except Ditolak as e:
+                sisa = deadline - time.monotonic()
+                if sisa <= 0:
+                    raise
+                await asyncio.sleep(min(max(e.retry_after, 0.05), sisa))
+        if tiket.selesai:
+            # request sudah berakhir selama menunggu slot
+            self._slot.release()
+            return
+        tiket.slot, tiket.mulai = True, time.perf_counter()
+
+    def keluar(self, tiket: Tiket):
+        if tiket.selesai:
+            return
+        tiket.selesai = True
+        durasi = time.perf_counter() - tiket.mulai
+        if tiket.slot:
+            self._slot.release()
+        with self._lock:
+            usage = self._usage[tiket.api_key]
+            usage.in_flight -= 1
+            usage.durasi_total += durasi
+            if tiket.ukur and tiket.slot:
+                self._durasi_ewma = 0.9 * self._durasi_ewma + 0.1 * durasi
+
+    async def masuk_antre(self, api_key: str, batas: float, ukur: bool = False,
+                          slot: bool = True) -> Tiket:
+        """Seperti masuk(), tapi penolakan ditunggu (Retry-After) sampai `batas` detik."""
+        deadline = time.monotonic() + batas
+        while True:
+            try:
+                tiket = await self.masuk(api_key, ukur=ukur, slot=slot)
+                tiket.antre = max(0.0, deadline - time.monotonic())
+                return tiket
+            except Ditolak as e:
+                sisa = deadline - time.monotonic()
+                if sisa <= 0:
+                    raise
+                await asyncio.sleep(min(max(e.retry_after, 0.05), sisa))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_inflight": self.max_inflight,
+                "menunggu": self._menunggu,
+                "estimasi_tunggu_s": round(self.estimasi_tunggu(), 3),
+                "per_key": {
+                    samarkan(key): {
+                        "diterima": u.diterima,
+                        "ditolak_rate": u.ditolak_rate,
+                        "ditolak_overload": u.ditolak_overload,
+                        "tanpa_slot": u.tanpa_slot,
+                        "in_flight": u.in_flight,
+                        "durasi_rata_s": round(u.durasi_total / u.diterima, 3) if u.diterima else 0.0,
+                    }
+                    for key, u in self._usage.items()
+                },
+            }
@@ -0,0 +1,152 @@
+# ======================================================
+# FILE: answer_cache.py
+# FASHA AI — Semantic Answer Cache (SEARCH & CHAT)
+# ======================================================
+# Pertanyaan yang hampir sama ("ada baju renang syar'i?" vs
+# "baju renang syari ada?") dijawab dari cache berdasarkan kemiripan
+# embedding query, tanpa retrieval & LLM lagi.
+#
+# Filter yang ikut menentukan jawaban (mis. budget → max_harga) bukan
+# bagian dari embedding: "kaos padel budget 300 ribu" vs "... 500 ribu"
+# hampir identik vektornya. Karena itu filter disimpan per entry dan
+# cache hanya hit jika filternya SAMA persis.
+#
+# Cache otomatis dikosongkan saat 01_build_index.py menulis ulang
+# file penanda versi index (INDEX_VERSION_FILE).
+
+import os
+import json
+import time
+import threading
+
+import numpy as np
+
+INDEX_VERSION_FILE = "index_version.txt"
+
+
+def read_index_version(db_path: str) -> str:
+    try:
+        with open(os.path.join(db_path, INDEX_VERSION_FILE), encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def filter_key(filters: dict = None) -> str:
+    """Filter → string kanonik (nilai None diabaikan)."""
+    aktif = {k: v for k, v in (filters or {}).items() if v is not None}
+    return json.dumps(aktif, sort_keys=True, default=str)
+
+
+class SemanticAnswerCache:
+    def __init__(self, threshold: float = 0.92, max_entries: int = 2000,
+                 ttl_seconds: float = 86400, db_path: str = "./chroma_db"):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._version_mtime = None
+        self._version = None
+        self._clear()
+
+    @classmethod
+    def from_env(cls, db_path: str = "./chroma_db"):
+        return cls(
+            threshold=float(os.environ.get("FASHA_ANSWER_CACHE_THRESHOLD", "0.92")),
+            max_entries=int(os.environ.get("FASHA_ANSWER_CACHE_SIZE", "2000")),
+            ttl_seconds=float(os.environ.get("FASHA_ANSWER_CACHE_TTL", "86400")),
+            db_path=db_path
+        )
+
+    def _clear(self):
+        self._vectors = None  # matriks (max_entries, dim), baris ter-normalisasi
+        self._intents = np.full(self.max_entries, "", dtype="<U8")
+        self._filters = np.full(self.max_entries, "", dtype=object)
+        self._answers = [None] * self.max_entries
+        self._created = np.zeros(self.max_entries)
+        self._last_used = np.zeros(self.max_entries)
+        self._size = 0
+
+    def _check_index_version(self):
+        path = os.path.join(self.db_path, INDEX_VERSION_FILE)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            mtime = None
+        if mtime == self._version_mtime:
+            return
+        self._version_mtime = mtime
+        version = read_index_version(self.db_path)
+        if self._version is not None and version != self._version:
+            self._clear()
+        self._version = version
+
+    @staticmethod
+    def _normalize(embedding):
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def lookup(self, intent: str, embedding, filters: dict = None):
+        q = self._normalize(embedding)
+        key = filter_key(filters)
+        now = time.time()
+        with self._lock:
+            self._check_index_version()
+            if not self._size:
+                self.misses += 1
+                return None
+
+            n = self._size
+            sims = self._vectors[:n] @ q
+            valid = (
+                (self._intents[:n] == intent)
+                & (self._filters[:n] == key)
+                & (now - self._created[:n] <= self.ttl_seconds)
+            )
+            sims[~valid] = -1.0
+
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            self._last_used[best] = now
+            self.hits += 1
+            return self._answers[best]
+
+    def store(self, intent: str, embedding, answer: str, filters: dict = None):
+        if not answer:
+            return
+        q = self._normalize(embedding)
+        now = time.time()
+        with self._lock:
+            self._check_index_version()
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, q.shape[0]), dtype=np.float32)
+
+            if self._size < self.max_entries:
+                slot = self._size
+                self._size += 1
+            else:
+                # Penuh → timpa entry yang paling lama tidak dipakai (LRU)
+                slot = int(np.argmin(self._last_used))
+
+            self._vectors[slot] = q
+            self._intents[slot] = intent
+            self._filters[slot] = filter_key(filters)
+            self._answers[slot] = answer
+            self._created[slot] = now
+            self._last_used[slot] = now
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,73 @@
+# ======================================================
+# FILE: concurrency.py
+# FASHA AI — Bounded Executor untuk Panggilan Blocking
+# ======================================================
+# Semua panggilan LLM, embedding dan Chroma di llama_index bersifat
+# synchronous. Kalau dipanggil langsung di dalam `async def`, satu call
+# OpenAI 5–10 detik akan membekukan seluruh event loop uvicorn.
+# Modul ini menjalankan panggilan tersebut di thread pool yang ukurannya
+# dibatasi, sehingga chat yang berjalan bersamaan bisa overlap.
+
+import os
+import asyncio
+import functools
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+# Jumlah maksimal panggilan blocking (LLM / retrieval) yang berjalan
+# bersamaan per worker. Sisanya antre di executor.
+MAX_CONCURRENCY = int(os.environ.get("FASHA_MAX_CONCURRENCY", "16"))
+
+_executor = ThreadPoolExecutor(
+    max_workers=MAX_CONCURRENCY,
+    thread_name_prefix="fasha-io"
+)
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Jalankan fungsi blocking di executor tanpa menahan event loop.
+
+    Context (contextvars) ikut disalin, seperti asyncio.to_thread.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(
+        _executor,
+        functools.partial(ctx.run, fn, *args, **kwargs)
+    )
+
+
+async def iterate_blocking(fn, *args, **kwargs):
+    """Iterasi generator blocking (mis. stream_complete) di executor.
+
+    Item diteruskan ke event loop lewat asyncio.Queue. Kalau consumer
+    berhenti di tengah jalan (klien putus), producer ikut dihentikan.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    berhenti = threading.Event()
+    selesai = object()
+
+    def produce():
+        try:
+            for item in fn(*args, **kwargs):
+                if berhenti.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, (item, None))
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, (None, e))
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, (selesai, None))
+
+    loop.run_in_executor(_executor, contextvars.copy_context().run, produce)
+    try:
+        while True:
+            item, error = await queue.get()
+            if error is not None:
+                raise error
+            if item is selesai:
+                break
+            yield item
+    finally:
+        berhenti.set()
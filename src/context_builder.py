@@ -0,0 +1,146 @@
+# ======================================================
+# FILE: context_builder.py
+# FASHA AI — Context Builder dengan Budget Token
+# ======================================================
+# Ukuran prompt (latency & biaya LLM) dibuat stabil:
+#   - produk dirender ringkas dari metadata (1–2 baris per produk),
+#     node duplikat dibuang
+#   - history & konteks produk dipotong ke budget token di prompts.py
+#     (history: pesan TERBARU yang dipertahankan)
+#   - PromptMeter mencatat jumlah token setiap prompt yang dikirim
+
+import re
+import logging
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from src.prompts import PROMPT_BUDGETS
+
+logger = logging.getLogger("FASHA_AI")
+
+
+@lru_cache(maxsize=1)
+def _tokenizer():
+    # di-import saat dipakai pertama kali agar import modul ini tetap ringan
+    from llama_index.core.utils import get_tokenizer
+    return get_tokenizer()
+
+
+def count_tokens(text: str) -> int:
+    return len(_tokenizer()(text)) if text else 0
+
+
+def budget(kind: str, part: str) -> int:
+    return PROMPT_BUDGETS.get(kind, {}).get(part, 0)
+
+
+def potong(text: str, max_tokens: int) -> str:
+    """Potong satu teks ke max_tokens (dipakai untuk satu baris yang terlalu panjang)."""
+    tokens = _tokenizer()(text)
+    if len(tokens) <= max_tokens:
+        return text
+    # potong proporsional panjang karakter, cukup akurat untuk menjaga budget
+    rasio = max_tokens / len(tokens)
+    return text[:max(int(len(text) * rasio) - 1, 0)] + "…"
+
+
+# ======================================================
+# 1. KONTEKS PRODUK
+# ======================================================
+def ambil_field(text: str, label: str) -> str:
+    match = re.search(rf"^\s*{label}:\s*(.+)$", text or "", re.MULTILINE)
+    return match.group(1).strip() if match else ""
+
+
+def render_produk(node) -> str:
+    meta = node.metadata
+    harga = f"Rp {int(meta.get('harga') or 0):,}".replace(",", ".")
+    sumber = "internal Zaneva" if meta.get("tier") == "premium" else "partner"
+    baris = (
+        f"- {meta.get('nama_produk', '')} | {meta.get('kategori', '')}/{meta.get('sub_kategori', '')}"
+        f" | {meta.get('gender', '')} | occasion: {meta.get('occasion', '')}"
+        f" | {harga} | {sumber}"
+    )
+    deskripsi = ambil_field(node.text, "Deskripsi")
+    warna = ambil_field(node.text, "Warna")
+    if deskripsi or warna:
+        baris += f"\n  {deskripsi}" + (f" Warna: {warna}." if warna else "")
+    return baris
+
+
+def dedupe_nodes(nodes: list) -> list:
+    """Buang node dengan produk yang sama (urutan & skor tertinggi dipertahankan)."""
+    terlihat, hasil = set(), []
+    for n in nodes:
+        key = n.metadata.get("product_id") or n.node.node_id
+        if key in terlihat:
+            continue
+        terlihat.add(key)
+        hasil.append(n)
+    return hasil
+
+
+def build_ctx(nodes: list, max_tokens: int) -> str:
+    """Produk dirender ringkas, ditambahkan berurutan selama muat di budget."""
+    baris, terpakai = [], 0
+    for n in dedupe_nodes(nodes):
+        teks = render_produk(n)
+        tokens = count_tokens(teks) + 1
+        if max_tokens and terpakai + tokens > max_tokens:
+            if not baris:
+                baris.append(potong(teks, max_tokens))
+            break
+        baris.append(teks)
+        terpakai += tokens
+    return "\n".join(baris)
+
+
+# ======================================================
+# 2. HISTORY
+# ======================================================
+def trim_history(history: list, max_tokens: int) -> str:
+    """Ambil pesan terbaru ke belakang selama muat di budget."""
+    if not max_tokens:
+        return "\n".join(history)
+    baris, terpakai = [], 0
+    for line in reversed(history):
+        tokens = count_tokens(line) + 1
+        if terpakai + tokens > max_tokens:
+            if not baris:
+                baris.append(potong(line, max_tokens))
+            break
+        baris.append(line)
+        terpakai += tokens
+    return "\n".join(reversed(baris))
+
+
+# ======================================================
+# 3. PENCATAT TOKEN PROMPT
+# ======================================================
+class PromptMeter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = defaultdict(int)
+        self._total = defaultdict(int)
+        self._max = defaultdict(int)
+
+    def record(self, kind: str, prompt: str) -> int:
+        tokens = count_tokens(prompt)
+        with self._lock:
+            self._calls[kind] += 1
+            self._total[kind] += tokens
+            self._max[kind] = max(self._max[kind], tokens)
+        logger.info("🧮 PROMPT | kind=%s | tokens=%d", kind, tokens)
+        return tokens
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                kind: {
+                    "calls": self._calls[kind],
+                    "avg_tokens": round(self._total[kind] / self._calls[kind], 1),
+                    "max_tokens": self._max[kind],
+                }
+                for kind in self._calls
+            }
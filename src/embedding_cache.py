@@ -0,0 +1,211 @@
+# ======================================================
+# FILE: embedding_cache.py
+# FASHA AI — Cache Embedding (LRU memory + opsional disk)
+# ======================================================
+# CachedEmbedding membungkus Settings.embed_model sehingga string yang
+# sama tidak pernah dikirim dua kali ke embeddings API:
+#   - LRU in-memory (vektor float32)
+#   - EmbeddingStore di SQLite (opsional), key = sha256(model + teks)
+# Query dinormalisasi (lowercase, spasi dirapikan) sebelum jadi key, dan
+# teks yang di-embed SAMA dengan teks key (selalu lewat get_query_embedding),
+# sehingga satu key tidak pernah berisi vektor dari string / mode berbeda.
+
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List
+
+import numpy as np
+from pydantic import PrivateAttr
+
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+
+# Kind key untuk query ternormalisasi (key "query" lama berisi vektor teks
+# mentah dengan key ternormalisasi, sengaja tidak dibaca lagi)
+QUERY_KIND = "query:norm"
+
+
+def normalize_query(text: str) -> str:
+    return re.sub(r"\s+", " ", text.strip().lower())
+
+
+def embedding_key(model_name: str, kind: str, text: str) -> str:
+    raw = f"{model_name}\x00{kind}\x00{text}".encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+# ======================================================
+# 1. PENYIMPANAN DISK (CONTENT-ADDRESSED)
+# ======================================================
+class EmbeddingStore:
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: List[str]) -> dict:
+        found = {}
+        with self._lock:
+            # batas parameter SQLite → query per 500 key
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, items: dict):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [
+                    (key, np.asarray(vec, dtype=np.float32).tobytes())
+                    for key, vec in items.items()
+                ]
+            )
+            self._conn.commit()
+
+
+# ======================================================
+# 2. WRAPPER EMBED MODEL
+# ======================================================
+class CachedEmbedding(BaseEmbedding):
+    inner: BaseEmbedding
+    max_entries: int = 5000
+
+    _memory: OrderedDict = PrivateAttr(default_factory=OrderedDict)
+    _store: Any = PrivateAttr(default=None)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _hits: int = PrivateAttr(default=0)
+    _misses: int = PrivateAttr(default=0)
+
+    def __init__(self, inner: BaseEmbedding, max_entries: int = 5000,
+                 store: EmbeddingStore = None, **kwargs: Any):
+        super().__init__(
+            inner=inner,
+            max_entries=max_entries,
+            model_name=inner.model_name,
+            embed_batch_size=inner.embed_batch_size,
+            **kwargs
+        )
+        self._store = store
+
+    @classmethod
+    def from_env(cls, inner: BaseEmbedding):
+        db_path = os.environ.get("FASHA_EMBED_CACHE_DB", "")
+        return cls(
+            inner,
+            max_entries=int(os.environ.get("FASHA_EMBED_CACHE_SIZE", "5000")),
+            store=EmbeddingStore(db_path) if db_path else None
+        )
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    # ---------- cache internals ----------
+    def _lookup_many(self, keys: List[str]) -> dict:
+        found = {}
+        with self._lock:
+            for key in keys:
+                vec = self._memory.get(key)
+                if vec is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vec
+
+        missing = [k for k in keys if k not in found]
+        if missing and self._store is not None:
+            from_disk = self._store.get_many(missing)
+            self._remember(from_disk, persist=False)
+            found.update(from_disk)
+
+        with self._lock:
+            self._hits += len(found)
+            self._misses += len(set(keys) - set(found))
+        return found
+
+    def _remember(self, items: dict, persist: bool = True):
+        if not items:
+            return
+        with self._lock:
+            for key, vec in items.items():
+                self._memory[key] = np.asarray(vec, dtype=np.float32)
+                self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+        if persist and self._store is not None:
+            self._store.put_many(items)
+
+    def _cached(self, kind: str, texts: List[str], compute) -> List[Embedding]:
+        keys = [embedding_key(self.model_name, kind, t) for t in texts]
+        found = self._lookup_many(keys)
+
+        # teks yang belum ada di cache → satu panggilan batch ke model asli
+        todo = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in todo:
+                todo[key] = text
+        if todo:
+            vectors = compute(list(todo.values()))
+            fresh = dict(zip(todo.keys(), vectors))
+            self._remember(fresh)
+            found.update({k: np.asarray(v, dtype=np.float32) for k, v in fresh.items()})
+
+        return [found[key].tolist() for key in keys]
+
+    # ---------- BaseEmbedding API ----------
+    def _get_query_embedding(self, query: str) -> Embedding:
+        return self._cached(
+            QUERY_KIND,
+            [normalize_query(query)],
+            lambda texts: [self.inner.get_query_embedding(texts[0])]
+        )[0]
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        query = normalize_query(query)
+        keys = [embedding_key(self.model_name, QUERY_KIND, query)]
+        found = self._lookup_many(keys)
+        if keys[0] in found:
+            return found[keys[0]].tolist()
+        vec = await self.inner.aget_query_embedding(query)
+        self._remember({keys[0]: vec})
+        return vec
+
+    def get_query_embeddings(self, queries: List[str], workers: int = 8) -> List[Embedding]:
+        """Banyak query sekaligus: yang belum di-cache di-embed paralel lewat query mode.
+
+        BaseEmbedding tidak punya batch untuk query mode, dan batch text mode
+        bisa menghasilkan vektor berbeda → tiap query tetap get_query_embedding.
+        """
+        def compute(texts: List[str]) -> List[Embedding]:
+            with ThreadPoolExecutor(max_workers=max(1, min(workers, len(texts)))) as pool:
+                return list(pool.map(self.inner.get_query_embedding, texts))
+
+        return self._cached(QUERY_KIND, [normalize_query(q) for q in queries], compute)
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return self._cached("text", texts, self.inner.get_text_embedding_batch)
+
+    def stats(self) -> dict:
+        total = self._hits + self._misses
+        return {
+            "entries": len(self._memory),
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / total, 4) if total else 0.0,
+            "persistent": self._store is not None,
+        }
@@ -0,0 +1,177 @@
+# ======================================================
+# FILE: index_snapshot.py
+# FASHA AI — Snapshot Index Read-Only (Memory-Mapped)
+# ======================================================
+# Untuk uvicorn --workers N: koleksi Chroma diekspor ke satu snapshot
+#   <FASHA_SNAPSHOT_DIR>/<versi>/embeddings.npy  (matriks ternormalisasi)
+#   <FASHA_SNAPSHOT_DIR>/<versi>/records.json    (ids, metadata, dokumen)
+#   <FASHA_SNAPSHOT_DIR>/CURRENT                 (nama versi aktif)
+# Semua worker me-memory-map embeddings.npy yang sama → halaman memori
+# dibagi oleh OS, pemakaian RAM tidak naik seiring jumlah worker, dan
+# worker tidak perlu membuka client Chroma sendiri.
+#
+# publish_snapshot menulis versi baru per halaman di folder sementara,
+# rename, lalu mengganti CURRENT dengan os.replace → worker tidak pernah
+# membaca snapshot setengah jadi.
+
+import os
+import json
+import shutil
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from src.vector_engine import NumpyVectorEngine, VectorState
+
+CURRENT_FILE = "CURRENT"
+SIMPAN_VERSI = 2  # jumlah versi yang disimpan, termasuk yang aktif (worker lama mungkin masih map)
+
+
+# ======================================================
+# 1. PUBLISH (dipanggil 01_build_index.py)
+# ======================================================
+def publish_snapshot(collection, snapshot_dir: str, dtype: str = "float32",
+                     page: int = 5000) -> str:
+    """Ekspor koleksi ke versi snapshot baru lalu aktifkan secara atomik → nama versi.
+
+    Ditulis per halaman: embedding langsung ke embeddings.npy lewat
+    open_memmap, ids / metadata / dokumen di-stream ke records.json →
+    memori puncak ditentukan `page`, bukan ukuran katalog.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    versi = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    sementara = os.path.join(snapshot_dir, f".tmp-{versi}")
+    os.makedirs(sementara)
+
+    total = collection.count()
+    path_matrix = os.path.join(sementara, "embeddings.npy")
+    matrix = None
+    # metadata & dokumen ditampung di file sementara, disambung ke records.json di akhir
+    kolom = {key: os.path.join(sementara, f".{key}.part") for key in ("metadatas", "documents")}
+    with open(os.path.join(sementara, "records.json"), "w", encoding="utf-8") as f, \
+            open(kolom["metadatas"], "w", encoding="utf-8") as f_meta, \
+            open(kolom["documents"], "w", encoding="utf-8") as f_doc:
+        f.write('{"ids": [')
+        for offset in range(0, total, page):
+            batch = collection.get(
+                include=["embeddings", "metadatas", "documents"], limit=page, offset=offset
+            )
+            if not len(batch["ids"]):
+                break
+            vectors = np.asarray(batch["embeddings"], dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            if matrix is None:
+                matrix = np.lib.format.open_memmap(
+                    path_matrix, mode="w+", dtype=dtype, shape=(total, vectors.shape[1])
+                )
+            matrix[offset:offset + len(vectors)] = vectors / np.where(norms == 0, 1, norms)
+
+            for tujuan, nilai in ((f, batch["ids"]), (f_meta, batch["metadatas"]),
+                                  (f_doc, batch["documents"])):
+                for i, item in enumerate(nilai):
+                    if offset or i:
+                        tujuan.write(", ")
+                    tujuan.write(json.dumps(item, ensure_ascii=False))
+
+        f_meta.flush()
+        f_doc.flush()
+        for key, part in kolom.items():
+            f.write(f'], "{key}": [')
+            with open(part, encoding="utf-8") as sumber:
+                shutil.copyfileobj(sumber, f)
+        f.write("]}")
+
+    for part in kolom.values():
+        os.remove(part)
+    if matrix is None:
+        np.save(path_matrix, np.zeros((0, 0), dtype=dtype))
+    else:
+        matrix.flush()
+        del matrix
+    os.rename(sementara, os.path.join(snapshot_dir, versi))
+
+    pointer = os.path.join(snapshot_dir, f"{CURRENT_FILE}.tmp")
+    with open(pointer, "w", encoding="utf-8") as f:
+        f.write(versi)
+    os.replace(pointer, os.path.join(snapshot_dir, CURRENT_FILE))
+
+    versi_lama = sorted(
+        d for d in os.listdir(snapshot_dir)
+        if d != versi and not d.startswith(".") and os.path.isdir(os.path.join(snapshot_dir, d))
+    )
+    for d in versi_lama[:max(len(versi_lama) - (SIMPAN_VERSI - 1), 0)]:
+        shutil.rmtree(os.path.join(snapshot_dir, d), ignore_errors=True)
+    return versi
+
+
+def current_version(snapshot_dir: str):
+    try:
+        with open(os.path.join(snapshot_dir, CURRENT_FILE), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+# ======================================================
+# 2. READER (pengganti collection Chroma, read-only)
+# ======================================================
+class IndexSnapshot:
+    """Snapshot aktif dengan API `get()` seperti collection Chroma.
+
+    Dipakai langsung oleh ProductIndex & LexicalIndex; embeddings berupa
+    memmap read-only. Isi versi aktif = satu VectorState (`data`) yang
+    ditukar sekaligus saat CURRENT berganti.
+    """
+
+    def __init__(self, snapshot_dir: str):
+        self.snapshot_dir = snapshot_dir
+        self.version = None
+        self.data = None
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self) -> VectorState:
+        versi = current_version(self.snapshot_dir)
+        if versi is None:
+            raise FileNotFoundError(f"Snapshot belum ada di {self.snapshot_dir}")
+        if versi == self.version:
+            return self.data
+        with self._lock:
+            if versi == self.version:
+                return self.data
+            folder = os.path.join(self.snapshot_dir, versi)
+            matrix = np.load(os.path.join(folder, "embeddings.npy"), mmap_mode="r")
+            with open(os.path.join(folder, "records.json"), encoding="utf-8") as f:
+                records = json.load(f)
+            self.data = VectorState.build(
+                matrix, records["ids"], records["metadatas"], records["documents"]
+            )
+            self.version = versi
+            return self.data
+
+    def count(self) -> int:
+        return len(self.data.ids)
+
+    def get(self, include=("metadatas", "documents"), limit: int = None, offset: int = 0) -> dict:
+        data = self.refresh()
+        akhir = None if limit is None else offset + limit
+        kolom = {
+            "embeddings": data.matrix,
+            "metadatas": data.metadatas,
+            "documents": data.documents,
+        }
+        return {
+            "ids": data.ids[offset:akhir],
+            **{key: kolom[key][offset:akhir] for key in include},
+        }
+
+
+class SnapshotVectorEngine(NumpyVectorEngine):
+    """NumpyVectorEngine di atas memmap snapshot: matriks TIDAK disalin per worker."""
+
+    def __init__(self, snapshot: IndexSnapshot, db_path: str = "./chroma_db"):
+        super().__init__(snapshot, db_path=db_path, dtype=str(snapshot.data.matrix.dtype))
+
+    def _load_state(self) -> VectorState:
+        return self.collection.refresh()
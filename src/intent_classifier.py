@@ -0,0 +1,332 @@
+# ======================================================
+# FILE: intent_classifier.py
+# FASHA AI — Fast-Path Intent Classifier (tanpa LLM)
+# ======================================================
+# Urutan keputusan:
+#   1. Keyword rules (diambil dari contoh di prompt llm_detect_intent
+#      dan keyword is_order_commitment)
+#   2. Model char n-gram Naive Bayes, dilatih dari keputusan LLM yang
+#      tercatat di FASHA_INTENT_LOG (lihat src/08_train_intent.py)
+#   3. Kalau confidence di bawah threshold → None, server memanggil LLM
+#
+# Log keputusan berisi pesan customer APA ADANYA (bisa memuat nama/alamat),
+# jadi opt-in: hanya ditulis jika FASHA_INTENT_LOG diisi. Penulisan lewat
+# thread latar (bukan di event loop) dan file dirotasi saat melewati
+# FASHA_INTENT_LOG_MAX_MB.
+
+import os
+import re
+import json
+import math
+import queue
+import logging
+import threading
+from collections import Counter, defaultdict
+
+logger = logging.getLogger("FASHA_AI")
+
+INTENTS = ("SEARCH", "ORDER", "CHAT")
+
+# ======================================================
+# 1. KEYWORD RULES
+# ======================================================
+# (keyword, bobot) — bobot 1.0 = sinyal kuat, 0.5 = sinyal lemah
+ORDER_COMMIT_KEYWORDS = [
+    "saya pesan",
+    "jadi pesan",
+    "jadi beli",
+    "checkout",
+    "order sekarang",
+    "ambil yang ini",
+    "saya mau pesan",
+    "saya mau beli",
+    "saya mau order",
+]
+
+ORDER_DETAIL_KEYWORDS = [
+    "size",
+    "ukuran",
+    "pcs",
+    "buah",
+    "qty",
+]
+
+KEYWORD_RULES = {
+    "SEARCH": [
+        ("rekomendasi", 1.0),
+        ("rekomen", 1.0),
+        ("lagi cari", 1.0),
+        ("mau cari", 1.0),
+        ("sedang cari", 1.0),
+        ("nyari", 1.0),
+        ("yang cocok buat", 1.0),
+        ("yang cocok untuk", 1.0),
+        ("ada produk", 1.0),
+        ("belum tahu yang mana", 1.0),
+        ("budget", 1.0),
+        ("cari", 0.5),
+        ("ada yang", 0.5),
+    ],
+    "ORDER": [
+        ("saya pesan", 1.0),
+        ("jadi pesan", 1.0),
+        ("jadi beli", 1.0),
+        ("checkout", 1.0),
+        ("order sekarang", 1.0),
+        ("ambil yang ini", 1.0),
+        ("saya mau pesan", 1.0),
+        ("saya mau order", 1.0),
+        ("kirim ke alamat", 1.0),
+        # "saya mau beli" bisa berarti masih eksplorasi (lihat prompt SEARCH)
+        ("saya mau beli", 0.5),
+        ("yang nomor", 0.5),
+    ] + [(k, 0.5) for k in ORDER_DETAIL_KEYWORDS],
+    "CHAT": [
+        ("apa bedanya", 1.0),
+        ("menurut kamu", 1.0),
+        ("tips", 1.0),
+        ("seperti apa", 1.0),
+        ("kriterianya", 1.0),
+        ("gimana cara", 1.0),
+        ("bagaimana cara", 1.0),
+        ("terima kasih", 1.0),
+        ("makasih", 1.0),
+        ("apa itu", 0.5),
+        ("kenapa", 0.5),
+    ],
+}
+
+_COMPILED_RULES = {
+    intent: [
+        (re.compile(r"\b" + re.escape(keyword) + r"\b"), weight)
+        for keyword, weight in rules
+    ]
+    for intent, rules in KEYWORD_RULES.items()
+}
+
+
+def normalize(text: str) -> str:
+    text = text.lower().replace("’", "'")
+    text = re.sub(r"[^\w\s']", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def rule_scores(text: str) -> dict:
+    scores = {}
+    for intent, rules in _COMPILED_RULES.items():
+        score = sum(weight for pattern, weight in rules if pattern.search(text))
+        if score:
+            scores[intent] = score
+    return scores
+
+
+def rule_confidence(scores: dict):
+    """Confidence tinggi hanya jika semua keyword menunjuk ke SATU intent."""
+    if not scores:
+        return None, 0.0
+    intent = max(scores, key=scores.get)
+    if len(scores) > 1:
+        return intent, 0.5 * scores[intent] / sum(scores.values())
+    return intent, min(0.99, 0.6 + 0.3 * scores[intent])
+
+
+# ======================================================
+# 2. CHAR N-GRAM NAIVE BAYES
+# ======================================================
+class NgramNaiveBayes:
+    def __init__(self, n_min: int = 2, n_max: int = 4, alpha: float = 1.0):
+        self.n_min = n_min
+        self.n_max = n_max
+        self.alpha = alpha
+        self.class_counts = Counter()
+        self.gram_counts = defaultdict(Counter)
+        self.gram_totals = Counter()
+        self.vocab = set()
+
+    def ngrams(self, text: str):
+        text = f" {normalize(text)} "
+        for n in range(self.n_min, self.n_max + 1):
+            for i in range(len(text) - n + 1):
+                yield text[i:i + n]
+
+    def fit(self, texts, labels):
+        for text, label in zip(texts, labels):
+            self.class_counts[label] += 1
+            grams = Counter(self.ngrams(text))
+            self.gram_counts[label].update(grams)
+            self.gram_totals[label] += sum(grams.values())
+            self.vocab.update(grams)
+        return self
+
+    def predict_proba(self, text: str) -> dict:
+        if not self.class_counts:
+            return {}
+        grams = Counter(self.ngrams(text))
+        total_docs = sum(self.class_counts.values())
+        vocab_size = len(self.vocab)
+
+        log_probs = {}
+        for label, n_docs in self.class_counts.items():
+            counts = self.gram_counts[label]
+            denom = math.log(self.gram_totals[label] + self.alpha * vocab_size)
+            log_p = math.log(n_docs / total_docs)
+            for gram, freq in grams.items():
+                log_p += freq * (math.log(counts.get(gram, 0) + self.alpha) - denom)
+            log_probs[label] = log_p
+
+        top = max(log_probs.values())
+        exp = {label: math.exp(lp - top) for label, lp in log_probs.items()}
+        norm = sum(exp.values())
+        return {label: v / norm for label, v in exp.items()}
+
+    def to_dict(self) -> dict:
+        return {
+            "n_min": self.n_min,
+            "n_max": self.n_max,
+            "alpha": self.alpha,
+            "class_counts": dict(self.class_counts),
+            "gram_counts": {k: dict(v) for k, v in self.gram_counts.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        model = cls(data["n_min"], data["n_max"], data["alpha"])
+        model.class_counts = Counter(data["class_counts"])
+        for label, counts in data["gram_counts"].items():
+            model.gram_counts[label] = Counter(counts)
+            model.gram_totals[label] = sum(counts.values())
+            model.vocab.update(counts)
+        return model
+
+
+def load_decisions(path: str):
+    """Baca keputusan intent dari LLM yang dicatat oleh record_decision()
+    (termasuk file hasil rotasi <path>.1)."""
+    texts, labels = [], []
+    for file in (path + ".1", path):
+        if not os.path.exists(file):
+            continue
+        with open(file, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                if row.get("intent") in INTENTS and row.get("text"):
+                    texts.append(row["text"])
+                    labels.append(row["intent"])
+    return texts, labels
+
+
+# ======================================================
+# 3. CLASSIFIER + COUNTER
+# ======================================================
+class IntentClassifier:
+    def __init__(self, model: NgramNaiveBayes = None, threshold: float = 0.85,
+                 decision_log: str = None, max_log_bytes: int = 10 * 1024 * 1024):
+        self.model = model
+        self.threshold = threshold
+        self.decision_log = decision_log
+        self.max_log_bytes = max_log_bytes
+        self.counters = Counter()
+        self._lock = threading.Lock()
+        self._antrean = queue.Queue(maxsize=10000)
+        self._penulis = None
+
+    @classmethod
+    def from_env(cls):
+        model = None
+        model_path = os.environ.get("FASHA_INTENT_MODEL", "intent_model.json")
+        if os.path.exists(model_path):
+            with open(model_path, encoding="utf-8") as f:
+                model = NgramNaiveBayes.from_dict(json.load(f))
+        return cls(
+            model=model,
+            threshold=float(os.environ.get("FASHA_INTENT_THRESHOLD", "0.85")),
+            decision_log=os.environ.get("FASHA_INTENT_LOG", "") or None,
+            max_log_bytes=int(float(os.environ.get("FASHA_INTENT_LOG_MAX_MB", "10")) * 1024 * 1024)
+        )
+
+    def classify(self, text: str):
+        """Return (intent, sumber). intent=None berarti harus tanya LLM."""
+        intent, sumber = self.tebak(text)
+        self.counters[sumber] += 1
+        return intent, sumber
+
+    def tebak(self, text: str):
+        """Seperti classify(), tanpa mencatat counter (mis. untuk prefetch batch)."""
+        intent, confidence = rule_confidence(rule_scores(normalize(text)))
+        if confidence >= self.threshold:
+            return intent, "rule"
+
+        if self.model is not None:
+            proba = self.model.predict_proba(text)
+            intent = max(proba, key=proba.get)
+            if proba[intent] >= self.threshold:
+                return intent, "model"
+
+        return None, "llm"
+
+    def record_decision(self, text: str, intent: str):
+        """Antrekan keputusan LLM sebagai data latih model n-gram (non-blocking)."""
+        if not self.decision_log or intent not in INTENTS:
+            return
+        with self._lock:
+            if self._penulis is None:
+                self._penulis = threading.Thread(target=self._tulis_log, name="intent-log", daemon=True)
+                self._penulis.start()
+        try:
+            self._antrean.put_nowait(json.dumps({"text": text, "intent": intent}, ensure_ascii=False))
+        except queue.Full:
+            pass  # penulis tertinggal → data latih boleh hilang, request tidak boleh tertahan
+
+    def _tulis_log(self):
+        """Thread latar: semua baris yang menumpuk ditulis dengan satu kali append."""
+        while True:
+            baris = [self._antrean.get()]
+            while True:
+                try:
+                    baris.append(self._antrean.get_nowait())
+                except queue.Empty:
+                    break
+            selesai = None in baris
+            baris = [b for b in baris if b is not None]
+            try:
+                if baris:
+                    self._rotasi()
+                    with open(self.decision_log, "a", encoding="utf-8") as f:
+                        f.write("\n".join(baris) + "\n")
+            except OSError as e:
+                logger.warning("⚠️ Gagal menulis log intent %s: %s", self.decision_log, e)
+            if selesai:
+                return
+
+    def _rotasi(self):
+        """Log melewati max_log_bytes → pindah ke <log>.1 (menimpa rotasi lama)."""
+        try:
+            if os.path.getsize(self.decision_log) >= self.max_log_bytes:
+                os.replace(self.decision_log, self.decision_log + ".1")
+        except OSError:
+            pass
+
+    def close(self, timeout: float = 5.0):
+        """Tulis sisa antrean sebelum server berhenti."""
+        with self._lock:
+            penulis, self._penulis = self._penulis, None
+        if penulis is not None:
+            try:
+                self._antrean.put(None, timeout=timeout)
+            except queue.Full:
+                return
+            penulis.join(timeout)
+
+    def stats(self) -> dict:
+        total = sum(self.counters.values())
+        fast = self.counters["rule"] + self.counters["model"]
+        return {
+            "total": total,
+            "rule": self.counters["rule"],
+            "model": self.counters["model"],
+            "llm": self.counters["llm"],
+            "fast_path_hit_rate": round(fast / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,182 @@
+# ======================================================
+# FILE: lexical_index.py
+# FASHA AI — Inverted Index BM25 + Fusi dengan Vector Search
+# ======================================================
+# Embedding sering meleset untuk nama produk persis dan istilah lokal
+# ("gamis", "kondangan", "padel"). LexicalIndex membangun inverted index
+# BM25 di memory dari dokumen koleksi Chroma saat server start:
+#   - exact_match : query yang menyebut nama produk → node langsung,
+#                   TANPA panggilan embedding (nama dicari per kata lewat
+#                   ProductIndex, difilter facet yang sama dengan search)
+#   - search      : skor BM25 + filter facet (boolean mask)
+#   - fuse        : Reciprocal Rank Fusion hasil vector + BM25
+# Dimuat ulang otomatis saat index_version.txt berubah (lihat versioned_index.py).
+
+import math
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+
+import numpy as np
+
+from llama_index.core.schema import NodeWithScore
+
+from src.product_index import ProductIndex, normalize_name
+from src.vector_engine import fetch_all, node_from_record, FacetColumns
+from src.versioned_index import VersionedIndex
+
+# Kata pengisi chat yang tidak membedakan produk
+STOPWORDS = {
+    "ada", "yang", "yg", "mau", "cari", "carikan", "saya", "aku", "kak", "kakak",
+    "dong", "ya", "apa", "untuk", "buat", "ini", "itu", "dan", "di", "ke", "dari",
+    "gak", "ga", "nggak", "tidak", "tolong", "info", "harga", "berapa", "produk",
+    "stok", "ready", "minta", "lihat", "liat", "tampilkan", "rekomendasi", "by",
+    "x", "the", "dengan", "atau", "bisa", "punya", "nya", "pakai", "pake",
+}
+
+# Kata yang menjelaskan filter (budget), bukan produk → boleh ada di samping nama
+KATA_FILTER = {
+    "budget", "bajet", "jt", "juta", "rb", "ribu", "k", "rp", "maks", "maksimal",
+    "max", "bawah", "dibawah", "kurang", "sampai", "sekitar", "murah",
+}
+
+
+def tokenize(text: str) -> list:
+    return [t for t in normalize_name(text).split() if t not in STOPWORDS]
+
+
+@dataclass(frozen=True)
+class LexicalState:
+    ids: list
+    metadatas: list
+    documents: list
+    facets: FacetColumns
+    posisi: dict      # id node → indeks dokumen
+    postings: dict    # term → (indeks dokumen, term frequency)
+    idf: dict
+    norm: np.ndarray  # normalisasi panjang dokumen BM25
+
+    def node(self, i: int, score: float) -> NodeWithScore:
+        return NodeWithScore(
+            node=node_from_record(self.ids[i], self.documents[i], self.metadatas[i]),
+            score=score
+        )
+
+
+class LexicalIndex(VersionedIndex):
+    def __init__(self, collection, db_path: str = "./chroma_db",
+                 k1: float = 1.5, b: float = 0.75, max_exact: int = 3,
+                 product_index: ProductIndex = None):
+        super().__init__(db_path)
+        self.collection = collection
+        self.product_index = product_index or ProductIndex(collection, db_path=db_path)
+        self.k1 = k1
+        self.b = b
+        self.max_exact = max_exact
+        self.state  # muat sekarang, bukan saat query pertama
+
+    # ---------- loading ----------
+    def _load_state(self) -> LexicalState:
+        data = fetch_all(self.collection, ["metadatas", "documents"])
+        ids, documents = data["ids"], data["documents"]
+
+        postings = defaultdict(lambda: ([], []))
+        lengths = np.zeros(len(ids), dtype=np.float32)
+        for i, doc in enumerate(documents):
+            tf = Counter(tokenize(doc or ""))
+            lengths[i] = sum(tf.values())
+            for term, count in tf.items():
+                postings[term][0].append(i)
+                postings[term][1].append(count)
+
+        n = len(ids)
+        postings = {
+            term: (np.array(docs, dtype=np.int64), np.array(tfs, dtype=np.float32))
+            for term, (docs, tfs) in postings.items()
+        }
+        idf = {
+            term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, (docs, _) in postings.items()
+        }
+        avg = float(lengths.mean()) if n else 1.0
+        return LexicalState(
+            ids=ids,
+            metadatas=data["metadatas"],
+            documents=documents,
+            facets=FacetColumns(data["metadatas"]),
+            posisi={node_id: i for i, node_id in enumerate(ids)},
+            postings=postings,
+            idf=idf,
+            norm=self.k1 * (1 - self.b + self.b * lengths / (avg or 1.0)),
+        )
+
+    def __len__(self):
+        return len(self.state.ids)
+
+    # ---------- exact name ----------
+    def exact_match(self, query: str, **facets) -> list:
+        """Query menyebut nama produk (utuh, atau semua kata kuncinya) → node.
+
+        Nama dicocokkan per kata (bukan substring) lewat ProductIndex, lalu
+        disaring facet yang sama dengan search (mis. max_harga). Kosong jika
+        tidak ada yang cocok, query memuat kata lain di luar nama (query lebih
+        luas), atau terlalu banyak produk yang cocok (query generik) →
+        serahkan ke hybrid search.
+        """
+        state = self.state
+        # angka & kata budget sudah ditangani facet, bukan bagian nama
+        terms = {
+            t for t in tokenize(query)
+            if t not in KATA_FILTER and not any(c.isdigit() for c in t)
+        }
+        if not terms:
+            return []
+
+        ids, kata_nama = self.product_index.mentions(query)
+        if not ids or terms - kata_nama:
+            ids = self.product_index.containing(terms) if len(terms) >= 2 else []
+
+        posisi = [state.posisi[i] for i in ids if i in state.posisi]
+        if posisi and any(v is not None for v in facets.values()):
+            mask = state.facets.mask(**facets)
+            posisi = [i for i in posisi if mask[i]]
+        if not posisi or len(posisi) > self.max_exact:
+            return []
+        return [state.node(i, 1.0) for i in posisi]
+
+    # ---------- BM25 ----------
+    def scores(self, query: str, **facets) -> np.ndarray:
+        return self._scores(self.state, query, facets)
+
+    def _scores(self, state: LexicalState, query: str, facets: dict) -> np.ndarray:
+        scores = np.zeros(len(state.ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = state.postings.get(term)
+            if posting is None:
+                continue
+            docs, tfs = posting
+            scores[docs] += state.idf[term] * tfs * (self.k1 + 1) / (tfs + state.norm[docs])
+        if any(v is not None for v in facets.values()):
+            scores[~state.facets.mask(**facets)] = 0.0
+        return scores
+
+    def search(self, query: str, top_k: int = 5, **facets) -> list:
+        state = self.state
+        scores = self._scores(state, query, facets)
+        k = min(top_k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [state.node(i, float(scores[i])) for i in top]
+
+
+def fuse(vector_nodes: list, lexical_nodes: list, top_k: int = 5, k: int = 60) -> list:
+    """Reciprocal Rank Fusion: skor = Σ 1 / (k + rank) dari tiap daftar."""
+    skor, nodes = defaultdict(float), {}
+    for daftar in (vector_nodes, lexical_nodes):
+        for rank, item in enumerate(daftar, 1):
+            skor[item.node.node_id] += 1.0 / (k + rank)
+            nodes.setdefault(item.node.node_id, item.node)
+
+    urut = sorted(skor, key=skor.get, reverse=True)[:top_k]
+    return [NodeWithScore(node=nodes[node_id], score=skor[node_id]) for node_id in urut]
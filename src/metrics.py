@@ -0,0 +1,162 @@
+# ======================================================
+# FILE: metrics.py
+# FASHA AI — Latency per Tahap Pipeline (format Prometheus)
+# ======================================================
+# Histogram durasi per tahap (intent LLM, embedding, vector search,
+# ekstraksi order, generation, storage, ...) dan jumlah panggilan LLM
+# per request. Ditampilkan di GET /metrics dalam format teks Prometheus.
+#
+# Overhead per observasi = 2x perf_counter + bisect + satu lock, tanpa
+# dependency tambahan.
+#
+# Pemakaian:
+#   @metrics.timed("intent_llm", llm=True)      → fungsi sync / async
+#   with metrics.stage("generation", llm=True):  → blok kode
+#   with metrics.request("/chat"):               → satu request penuh
+
+import time
+import bisect
+import asyncio
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LLM_CALL_BUCKETS = (0, 1, 2, 3, 4, 5)
+
+# Jumlah panggilan LLM di request yang sedang berjalan (ikut ke thread
+# executor karena run_blocking menyalin context)
+_llm_calls = contextvars.ContextVar("fasha_llm_calls", default=None)
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, label: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}  # nilai label → [counts per bucket..., +Inf], sum
+
+    def observe(self, label_value: str, value: float):
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][idx] += 1
+            series[1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: (list(v[0]), v[1]) for k, v in self._series.items()}
+        for label_value, (counts, total) in sorted(series.items()):
+            label = f'{self.label}="{_label(label_value)}"'
+            kumulatif = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                kumulatif += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {kumulatif}')
+            lines.append(f"{self.name}_sum{{{label}}} {total}")
+            lines.append(f"{self.name}_count{{{label}}} {kumulatif}")
+        return lines
+
+
+class CounterMetric:
+    def __init__(self, name: str, help: str, label: str):
+        self.name = name
+        self.help = help
+        self.label = label
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, label_value: str, amount: float = 1):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for label_value, value in sorted(values.items()):
+            lines.append(f'{self.name}{{{self.label}="{_label(label_value)}"}} {value}')
+        return lines
+
+
+class PipelineMetrics:
+    def __init__(self):
+        self.stage_seconds = Histogram(
+            "fasha_stage_duration_seconds", "Durasi tiap tahap pipeline chat", "stage"
+        )
+        self.request_seconds = Histogram(
+            "fasha_request_duration_seconds", "Durasi request chat end-to-end", "endpoint"
+        )
+        self.llm_per_request = Histogram(
+            "fasha_llm_calls_per_request", "Jumlah panggilan LLM per request", "endpoint",
+            buckets=LLM_CALL_BUCKETS
+        )
+        self.llm_calls = CounterMetric(
+            "fasha_llm_calls_total", "Total panggilan LLM per tahap", "stage"
+        )
+        self.requests = CounterMetric(
+            "fasha_requests_total", "Total request chat", "endpoint"
+        )
+        self.rejected = CounterMetric(
+            "fasha_requests_rejected_total", "Request yang ditolak admission control", "status"
+        )
+
+    @contextmanager
+    def stage(self, name: str, llm: bool = False):
+        mulai = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds.observe(name, time.perf_counter() - mulai)
+            if llm:
+                self.llm_calls.inc(name)
+                calls = _llm_calls.get()
+                if calls is not None:
+                    calls[0] += 1
+
+    def timed(self, name: str, llm: bool = False):
+        def decorator(fn):
+            if asyncio.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    with self.stage(name, llm):
+                        return await fn(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.stage(name, llm):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @contextmanager
+    def request(self, endpoint: str):
+        calls = [0]
+        _llm_calls.set(calls)
+        mulai = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.request_seconds.observe(endpoint, time.perf_counter() - mulai)
+            self.llm_per_request.observe(endpoint, calls[0])
+            self.requests.inc(endpoint)
+
+    def render(self) -> str:
+        lines = []
+        for metric in (self.requests, self.rejected, self.request_seconds, self.stage_seconds,
+                       self.llm_calls, self.llm_per_request):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = PipelineMetrics()
@@ -0,0 +1,170 @@
+# ======================================================
+# FILE: offline_models.py
+# FASHA AI — LLM & Embedding Lokal untuk Load Test (Offline)
+# ======================================================
+# Pengganti Settings.llm dan Settings.embed_model yang deterministik,
+# tanpa network & tanpa biaya OpenAI. Aktif dengan FASHA_OFFLINE_MODELS=1.
+#   - OfflineLLM       : jawab prompt intent / mode / router / ekstraksi
+#                        order dengan aturan keyword & regex, prompt lain
+#                        dijawab teks tetap. Latency buatan per call.
+#   - OfflineEmbedding : vektor hash per kata (teks mirip → vektor mirip),
+#                        dimensi sama dengan text-embedding-3-small.
+# Hanya untuk mengukur throughput server, BUKAN untuk kualitas jawaban.
+
+import os
+import re
+import json
+import time
+import hashlib
+from functools import lru_cache
+from typing import Any, List
+
+import numpy as np
+
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.llms import CustomLLM, CompletionResponse, LLMMetadata
+
+from src.intent_classifier import normalize, rule_scores
+
+JAWABAN_TETAP = (
+    "Siap Kak 😊 Berikut beberapa pilihan yang cocok untuk kebutuhan Kakak. "
+    "Kalau ada yang menarik, sebutkan nama produknya ya, nanti aku bantu lanjut."
+)
+
+
+def pesan_terakhir(prompt: str) -> str:
+    """Ambil pesan user dari prompt intent / mode / router / ekstraksi order."""
+    match = re.search(r'PESAN USER:\s*"(.*)"', prompt, re.DOTALL)
+    if match:
+        return match.group(1)
+    match = re.search(r"PESAN TERAKHIR:\s*(.*)$", prompt, re.DOTALL)
+    return match.group(1).strip() if match else prompt
+
+
+def teks_user(prompt: str) -> str:
+    """Baris "User:" di history + pesan terakhir (teks bot diabaikan)."""
+    baris = [l[len("User:"):].strip() for l in prompt.splitlines() if l.startswith("User:")]
+    return "\n".join(baris + [pesan_terakhir(prompt)])
+
+
+def tebak_intent(pesan: str) -> str:
+    scores = rule_scores(normalize(pesan))
+    return max(scores, key=scores.get) if scores else "CHAT"
+
+
+def ekstrak_lokal(chat: str) -> dict:
+    """Ekstraksi order berbasis regex dari seluruh chat (history + pesan)."""
+    cari = lambda pola: re.findall(pola, chat, re.IGNORECASE)
+    item = cari(
+        r"\b(?:pesan|beli|ambil|order)\s+(.+?)(?=\s+(?:ukuran|size|warna|\d+\s*pcs)\b|[,.\n]|$)"
+    )
+    nama = cari(r"nama\s*:?\s*([^,\n]+)")
+    alamat = cari(r"alamat\s*:?\s*([^\n]+?)(?=,\s*(?:qty|jumlah)\b|\n|$)")
+    qty = cari(r"(?:qty|jumlah)\s*:?\s*(\d+)|(\d+)\s*pcs")
+    size = cari(r"(?:ukuran|size)\s+(\w+)")
+    return {
+        "status": "COMPLETE" if item and nama and alamat else "INCOMPLETE",
+        "nama": nama[-1].strip() if nama else "",
+        "alamat": alamat[-1].strip() if alamat else "",
+        "item": item[-1].strip() if item else "",
+        "size": size[-1] if size else "",
+        "qty": int(next(filter(None, qty[-1]))) if qty else 1,
+        "unit_price": 0,
+    }
+
+
+# ======================================================
+# 1. LLM
+# ======================================================
+class OfflineLLM(CustomLLM):
+    latency: float = 0.5
+    reply: str = JAWABAN_TETAP
+
+    @classmethod
+    def from_env(cls):
+        return cls(latency=float(os.environ.get("FASHA_OFFLINE_LLM_LATENCY", "0.5")))
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "OfflineLLM"
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name="offline")
+
+    def jawab(self, prompt: str) -> str:
+        if "Balas dengan SALAH SATU dari:\nSEARCH" in prompt:
+            return tebak_intent(pesan_terakhir(prompt))
+        if "Balas dengan SALAH SATU dari:\nEMPLOYEE" in prompt:
+            return "EMPLOYEE"
+        if '{"intent":' in prompt:
+            intent = tebak_intent(pesan_terakhir(prompt))
+            data = ekstrak_lokal(teks_user(prompt)) if intent == "ORDER" else {}
+            return json.dumps({"intent": intent, "mode": "EMPLOYEE", **data})
+        if prompt.lstrip().startswith("Ekstrak data order"):
+            return json.dumps(ekstrak_lokal(teks_user(prompt)))
+        return self.reply
+
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        time.sleep(self.latency)
+        return CompletionResponse(text=self.jawab(prompt))
+
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any):
+        kata = self.jawab(prompt).split(" ")
+        jeda = self.latency / max(len(kata), 1)
+
+        def gen():
+            teks = ""
+            for i, k in enumerate(kata):
+                time.sleep(jeda)
+                delta = k if i == 0 else " " + k
+                teks += delta
+                yield CompletionResponse(text=teks, delta=delta)
+
+        return gen()
+
+
+# ======================================================
+# 2. EMBEDDING
+# ======================================================
+@lru_cache(maxsize=50000)
+def _vektor_kata(kata: str, dim: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(kata.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+
+class OfflineEmbedding(BaseEmbedding):
+    dim: int = 1536
+    latency: float = 0.05
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            model_name="offline-hash",
+            latency=float(os.environ.get("FASHA_OFFLINE_EMBED_LATENCY", "0.05"))
+        )
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "OfflineEmbedding"
+
+    def _embed(self, text: str) -> Embedding:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for kata in normalize(text).split():
+            vec += _vektor_kata(kata, self.dim)
+        norm = np.linalg.norm(vec)
+        return (vec / norm if norm else vec).tolist()
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        time.sleep(self.latency)
+        return self._embed(query)
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        time.sleep(self.latency)
+        return [self._embed(t) for t in texts]
@@ -0,0 +1,141 @@
+# ======================================================
+# FILE: product_index.py
+# FASHA AI — Lookup Nama Produk (Exact + Fuzzy Trigram)
+# ======================================================
+# Dibangun dari metadata koleksi Chroma (nama_produk, harga, tier,
+# affiliate_link, ...). Nama item hasil ekstraksi order di-resolve ke
+# produk tanpa embedding:
+#   1. exact match nama yang sudah dinormalisasi
+#   2. fuzzy trigram (porsi trigram query yang ada di nama produk)
+# Juga dipakai LexicalIndex.exact_match untuk mencari nama produk yang
+# DISEBUT di dalam pertanyaan (batas kata, tanpa scan semua nama).
+# Index dimuat ulang otomatis saat index_version.txt berubah (lihat versioned_index.py).
+
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+
+from src.versioned_index import VersionedIndex
+
+
+def normalize_name(text: str) -> str:
+    text = str(text).lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def trigrams(text: str) -> set:
+    grams = set()
+    for word in text.split():
+        padded = f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+@dataclass(frozen=True)
+class ProductState:
+    ids: list
+    products: list    # metadata produk
+    exact: dict       # nama ternormalisasi → idx
+    grams: list       # trigram nama per produk
+    postings: dict    # trigram → [idx]
+    first: dict       # kata pertama nama → [(kata nama, idx)]
+    words: dict       # kata → {idx produk yang namanya memuat kata itu}
+
+
+class ProductIndex(VersionedIndex):
+    def __init__(self, collection, db_path: str = "./chroma_db", min_score: float = 0.7):
+        super().__init__(db_path)
+        self.collection = collection
+        self.min_score = min_score
+
+    def _load_state(self) -> ProductState:
+        data = self.collection.get(include=["metadatas"])
+        id_list, products, exact, grams_list = [], [], {}, []
+        postings, first, words = defaultdict(list), defaultdict(list), defaultdict(set)
+        for product_id, meta in zip(data["ids"], data["metadatas"]):
+            meta = meta or {}
+            name = normalize_name(meta.get("nama_produk", ""))
+            if not name:
+                continue
+            idx = len(products)
+            id_list.append(product_id)
+            products.append(meta)
+            exact.setdefault(name, idx)
+            grams = trigrams(name)
+            grams_list.append(grams)
+            for gram in grams:
+                postings[gram].append(idx)
+            tokens = tuple(name.split())
+            first[tokens[0]].append((tokens, idx))
+            for word in tokens:
+                words[word].add(idx)
+        return ProductState(
+            id_list, products, exact, grams_list, dict(postings), dict(first), dict(words)
+        )
+
+    def __len__(self):
+        return len(self.state.products)
+
+    def resolve(self, item_name: str):
+        """Nama item → metadata produk, atau None jika tidak ada yang mirip."""
+        state = self.state
+        query = normalize_name(item_name)
+        if not query:
+            return None
+
+        idx = state.exact.get(query)
+        if idx is not None:
+            return state.products[idx]
+
+        query_grams = trigrams(query)
+        shared = Counter()
+        for gram in query_grams:
+            for idx in state.postings.get(gram, ()):
+                shared[idx] += 1
+        if not shared:
+            return None
+
+        def score(idx):
+            common = shared[idx]
+            coverage = common / len(query_grams)
+            dice = 2 * common / (len(query_grams) + len(state.grams[idx]))
+            return coverage, dice
+
+        best = max(shared, key=score)
+        if score(best)[0] < self.min_score:
+            return None
+        return state.products[best]
+
+    def mentions(self, text: str) -> tuple:
+        """Nama produk yang disebut utuh di teks (batas kata) → (id produk, kata nama).
+
+        Jika nama yang cocok saling tumpang tindih ("jaket bomber" di dalam
+        "jaket bomber premium"), hanya nama terpanjang yang dipakai.
+        """
+        state = self.state
+        words = normalize_name(text).split()
+        spans = []
+        for start, word in enumerate(words):
+            for tokens, idx in state.first.get(word, ()):
+                end = start + len(tokens)
+                if tuple(words[start:end]) == tokens:
+                    spans.append((start, end, idx))
+        spans = [
+            (start, end, idx) for start, end, idx in spans
+            if not any(s <= start and end <= e and e - s > end - start for s, e, _ in spans)
+        ]
+        ids = list(dict.fromkeys(state.ids[idx] for _, _, idx in spans))
+        matched = {word for start, end, _ in spans for word in words[start:end]}
+        return ids, matched
+
+    def containing(self, words) -> list:
+        """Id produk yang namanya memuat SEMUA kata (irisan posting per kata)."""
+        state = self.state
+        hasil = None
+        for word in words:
+            idxs = state.words.get(word, set())
+            hasil = idxs if hasil is None else hasil & idxs
+            if not hasil:
+                return []
+        return [state.ids[idx] for idx in sorted(hasil or ())]
@@ -3,6 +3,17 @@
 # FASHA AI — Prompt Definitions
 # ======================================================
 
+# ===============================
+# BUDGET TOKEN PER PROMPT
+# ===============================
+# Batas token untuk bagian yang ukurannya berubah-ubah (history chat &
+# konteks produk). Dipakai oleh src/context_builder.py.
+PROMPT_BUDGETS = {
+    "SEARCH": {"ctx": 700},
+    "ROUTER": {"history": 500},
+    "ORDER": {"history": 500},
+}
+
 # ===============================
 # EMPLOYEE (CS ZANEVA)
 # ===============================
@@ -0,0 +1,192 @@
+# ======================================================
+# FILE: session_store.py
+# FASHA AI — Penyimpanan State Percakapan per Session
+# ======================================================
+# Setiap customer (Telegram chat, tab web UI, dll) punya history dan
+# ORDER_STATE sendiri. Backend:
+#   - memory : OrderedDict dengan batas jumlah session, idle TTL & LRU
+#   - sqlite : tabel `sessions`, bertahan saat server restart dan bisa
+#              dipakai bersama oleh beberapa worker uvicorn
+# Dari kode async pakai aget() / asave(): backend sqlite menjalankan query
+# & commit di executor, bukan di event loop.
+
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from src.concurrency import run_blocking
+
+MAX_HISTORY = 15
+
+
+@dataclass
+class SessionState:
+    history: list = field(default_factory=list)
+    order_state: str = "IDLE"
+    # IDLE | AWAITING_CONFIRMATION | COLLECTING_DATA | WAITING_PAYMENT
+    last_seen: float = field(default_factory=time.time)
+    order_id: str = None  # pesanan yang sedang menunggu pembayaran
+
+
+# ======================================================
+# 1. IN-MEMORY (DEFAULT)
+# ======================================================
+class InMemorySessionStore:
+    def __init__(self, max_sessions: int = 10000, ttl_seconds: float = 3600):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> SessionState:
+        now = time.time()
+        with self._lock:
+            state = self._data.get(session_id)
+            if state is None or now - state.last_seen > self.ttl_seconds:
+                return SessionState(last_seen=now)
+            self._data.move_to_end(session_id)
+            return state
+
+    def save(self, session_id: str, state: SessionState):
+        state.history = state.history[-MAX_HISTORY:]
+        state.last_seen = time.time()
+        with self._lock:
+            self._data[session_id] = state
+            self._data.move_to_end(session_id)
+            self._evict(state.last_seen)
+
+    # operasi dict di memory → cukup langsung di event loop
+    async def aget(self, session_id: str) -> SessionState:
+        return self.get(session_id)
+
+    async def asave(self, session_id: str, state: SessionState):
+        self.save(session_id, state)
+
+    def _evict(self, now: float):
+        # Session paling lama tidak aktif ada di depan OrderedDict
+        while self._data:
+            oldest_id, oldest = next(iter(self._data.items()))
+            expired = now - oldest.last_seen > self.ttl_seconds
+            if not expired and len(self._data) <= self.max_sessions:
+                break
+            del self._data[oldest_id]
+
+    def __len__(self):
+        return len(self._data)
+
+
+# ======================================================
+# 2. SQLITE (OPSIONAL)
+# ======================================================
+class SQLiteSessionStore:
+    PURGE_EVERY = 500  # bersihkan session kadaluarsa tiap N save
+
+    def __init__(self, path: str = "sessions.db", ttl_seconds: float = 3600):
+        self.ttl_seconds = ttl_seconds
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id  TEXT PRIMARY KEY,
+                history     TEXT NOT NULL,
+                order_state TEXT NOT NULL,
+                last_seen   REAL NOT NULL,
+                order_id    TEXT
+            )
+            """
+        )
+        # database lama (sebelum kolom order_id)
+        kolom = {row[1] for row in self._conn.execute("PRAGMA table_info(sessions)")}
+        if "order_id" not in kolom:
+            self._conn.execute("ALTER TABLE sessions ADD COLUMN order_id TEXT")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_sessions_last_seen ON sessions(last_seen)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._saves = 0
+
+    def get(self, session_id: str) -> SessionState:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT history, order_state, last_seen, order_id FROM sessions WHERE session_id = ?",
+                (session_id,)
+            ).fetchone()
+        if row is None or now - row[2] > self.ttl_seconds:
+            return SessionState(last_seen=now)
+        return SessionState(
+            history=json.loads(row[0]), order_state=row[1], last_seen=row[2], order_id=row[3]
+        )
+
+    def save(self, session_id: str, state: SessionState):
+        state.history = state.history[-MAX_HISTORY:]
+        state.last_seen = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO sessions (session_id, history, order_state, last_seen, order_id)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(session_id) DO UPDATE SET
+                    history = excluded.history,
+                    order_state = excluded.order_state,
+                    last_seen = excluded.last_seen,
+                    order_id = excluded.order_id
+                """,
+                (session_id, json.dumps(state.history), state.order_state, state.last_seen,
+                 state.order_id)
+            )
+            self._saves += 1
+            if self._saves % self.PURGE_EVERY == 0:
+                self._conn.execute(
+                    "DELETE FROM sessions WHERE last_seen < ?",
+                    (state.last_seen - self.ttl_seconds,)
+                )
+            self._conn.commit()
+
+    async def aget(self, session_id: str) -> SessionState:
+        return await run_blocking(self.get, session_id)
+
+    async def asave(self, session_id: str, state: SessionState):
+        await run_blocking(self.save, session_id, state)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+# ======================================================
+# 3. FACTORY & LOCK PER SESSION
+# ======================================================
+def build_session_store():
+    backend = os.environ.get("FASHA_SESSION_BACKEND", "memory").lower()
+    ttl = float(os.environ.get("FASHA_SESSION_TTL", "3600"))
+
+    if backend == "sqlite":
+        return SQLiteSessionStore(
+            path=os.environ.get("FASHA_SESSION_DB", "sessions.db"),
+            ttl_seconds=ttl
+        )
+    return InMemorySessionStore(
+        max_sessions=int(os.environ.get("FASHA_SESSION_MAX", "10000")),
+        ttl_seconds=ttl
+    )
+
+
+_session_locks = weakref.WeakValueDictionary()
+
+
+def session_lock(session_id: str) -> asyncio.Lock:
+    """Lock per session: pesan dari session yang sama diproses berurutan."""
+    lock = _session_locks.get(session_id)
+    if lock is None:
+        lock = asyncio.Lock()
+        _session_locks[session_id] = lock
+    return lock
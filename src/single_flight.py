@@ -0,0 +1,153 @@
+# ======================================================
+# FILE: single_flight.py
+# FASHA AI — Request Coalescing (Single-Flight)
+# ======================================================
+# Saat kampanye banyak user mengirim pesan yang PERSIS sama ("ada promo?")
+# dalam hitungan detik. Tanpa coalescing setiap pesan memicu intent LLM,
+# embedding, retrieval dan generation sendiri-sendiri.
+#
+# Request pertama untuk sebuah kunci menjadi LEADER: pekerjaannya dijalankan
+# sebagai task terpisah (tetap jalan walau klien leader putus). Request lain
+# dengan kunci yang sama selama task masih berjalan menjadi FOLLOWER dan
+# menunggu hasil leader.
+#   - do(kunci, fn)          → hasil tunggal (mis. intent)
+#   - siaran(kunci, produce) → potongan teks yang bisa diikuti beberapa
+#                              stream sekaligus (follower yang datang belakangan
+#                              tetap menerima potongan dari awal)
+#
+# Kunci HARUS hanya berisi data yang sama untuk semua session (mis. intent +
+# pesan ternormalisasi), bukan state percakapan.
+#
+# tandai(pesan) / lepas(pesan) mencatat pesan yang sedang diproses SEBELUM
+# leader sempat mendaftarkan kuncinya → server bisa melewatkan slot admission
+# untuk request yang kemungkinan besar hanya menjadi follower.
+
+import os
+import asyncio
+import logging
+import threading
+from collections import Counter
+
+logger = logging.getLogger("FASHA_AI")
+
+
+class Siaran:
+    """Teks jawaban yang diproduksi satu kali dan dibaca oleh banyak request."""
+
+    def __init__(self):
+        self.potongan = []
+        self.selesai = False
+        self.error = None
+        self._cond = asyncio.Condition()
+
+    async def kirim(self, delta: str):
+        async with self._cond:
+            self.potongan.append(delta)
+            self._cond.notify_all()
+
+    async def tutup(self, error: BaseException = None):
+        async with self._cond:
+            self.selesai = True
+            self.error = error
+            self._cond.notify_all()
+
+    async def ikuti(self):
+        """Iterasi semua potongan dari awal sampai siaran ditutup."""
+        i = 0
+        while True:
+            async with self._cond:
+                await self._cond.wait_for(lambda: len(self.potongan) > i or self.selesai)
+                baru = self.potongan[i:]
+                selesai = self.selesai and i + len(baru) == len(self.potongan)
+            for delta in baru:
+                yield delta
+            i += len(baru)
+            if selesai:
+                if self.error is not None:
+                    raise self.error
+                return
+
+    async def hasil(self) -> str:
+        return "".join([delta async for delta in self.ikuti()])
+
+
+class SingleFlight:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._aktif = {}
+        self._pesan = Counter()
+        self._stats = {"leader": 0, "follower": 0}
+
+    @classmethod
+    def from_env(cls):
+        return cls(enabled=os.environ.get("FASHA_COALESCE", "1") == "1")
+
+    def _catat(self, kunci, peran: str):
+        with self._lock:
+            self._stats[peran] += 1
+        if peran == "follower":
+            logger.info("🔗 COALESCE | follower | kunci=%s", kunci)
+
+    def _jalankan(self, kunci, coro, bersama):
+        """Mulai task leader; `bersama` = objek yang dibagikan ke follower."""
+        task = asyncio.create_task(coro)
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        if self.enabled:
+            self._aktif[kunci] = bersama or task
+            task.add_done_callback(lambda t: self._aktif.pop(kunci, None))
+        return task
+
+    async def do(self, kunci, fn):
+        """Jalankan coroutine fn() sekali per kunci yang sedang berjalan → hasil fn."""
+        task = self._aktif.get(kunci) if self.enabled else None
+        if task is not None:
+            self._catat(kunci, "follower")
+        else:
+            self._catat(kunci, "leader")
+            task = self._jalankan(kunci, fn(), None)
+        # shield: request yang dibatalkan tidak ikut membatalkan pekerjaan bersama
+        return await asyncio.shield(task)
+
+    def siaran(self, kunci, produce) -> tuple:
+        """→ (Siaran, leader?). produce(siaran) hanya dipanggil oleh leader."""
+        siaran = self._aktif.get(kunci) if self.enabled else None
+        if siaran is not None:
+            self._catat(kunci, "follower")
+            return siaran, False
+
+        self._catat(kunci, "leader")
+        siaran = Siaran()
+
+        async def jalan():
+            try:
+                await produce(siaran)
+            except BaseException as e:
+                await siaran.tutup(e)
+                raise
+            await siaran.tutup()
+
+        self._jalankan(kunci, jalan(), siaran)
+        return siaran, True
+
+    def tandai(self, pesan) -> bool:
+        """Catat pesan yang mulai diproses → True jika pesan identik sudah lebih dulu jalan."""
+        with self._lock:
+            ikut = self.enabled and self._pesan[pesan] > 0
+            self._pesan[pesan] += 1
+        return ikut
+
+    def lepas(self, pesan):
+        with self._lock:
+            self._pesan[pesan] -= 1
+            if self._pesan[pesan] <= 0:
+                del self._pesan[pesan]
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self._stats["leader"] + self._stats["follower"]
+            return {
+                **self._stats,
+                "in_flight": len(self._aktif),
+                "coalesced_rate": round(self._stats["follower"] / total, 4) if total else 0.0,
+            }
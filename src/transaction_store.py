@@ -0,0 +1,176 @@
+# ======================================================
+# FILE: transaction_store.py
+# FASHA AI — Penyimpanan Transaksi (SQLite WAL)
+# ======================================================
+# Pengganti append ke data_transaksi.csv:
+#   - tabel `transaksi` dengan index nama customer, status & tanggal
+#   - penulisan lewat SATU thread writer di background, di-batch per
+#     transaksi SQLite → simpan pesanan tidak menambah latency /chat
+#   - konfirmasi pembayaran mengubah status PENDING → PAID di tempat
+#   - import_csv: pindahkan CSV lama sekali jalan (idempotent)
+# Urutan operasi dijaga oleh antrian: insert selalu ditulis sebelum
+# update status dari session yang sama.
+
+import os
+import csv
+import uuid
+import queue
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger("FASHA_AI")
+
+KOLOM_CSV = ["Tanggal", "Nama", "Item", "Harga", "Alamat", "Status"]
+
+
+class TransactionStore:
+    def __init__(self, path: str = "transaksi.db", batch_size: int = 50,
+                 flush_interval: float = 0.2):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS transaksi (
+                order_id   TEXT PRIMARY KEY,
+                session_id TEXT,
+                tanggal    TEXT NOT NULL,
+                nama       TEXT,
+                item       TEXT,
+                harga      TEXT,
+                alamat     TEXT,
+                status     TEXT NOT NULL
+            )
+            """
+        )
+        for kolom in ("nama", "status", "tanggal", "session_id"):
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_transaksi_{kolom} ON transaksi({kolom})"
+            )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+        self._queue = queue.Queue()
+        self._written = 0
+        self._batches = 0
+        self._errors = 0
+        self._writer = threading.Thread(target=self._run_writer, name="transaksi-writer", daemon=True)
+        self._writer.start()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            path=os.environ.get("FASHA_TRANSAKSI_DB", "transaksi.db"),
+            batch_size=int(os.environ.get("FASHA_TRANSAKSI_BATCH", "50")),
+            flush_interval=float(os.environ.get("FASHA_TRANSAKSI_FLUSH", "0.2"))
+        )
+
+    # ---------- writer background ----------
+    def _run_writer(self):
+        while True:
+            ops = [self._queue.get()]
+            try:
+                # kumpulkan operasi yang datang berdekatan → satu commit
+                while len(ops) < self.batch_size:
+                    ops.append(self._queue.get(timeout=self.flush_interval))
+            except queue.Empty:
+                pass
+
+            berhenti = None in ops
+            self._write([op for op in ops if op is not None])
+            for _ in ops:
+                self._queue.task_done()
+            if berhenti:
+                return
+
+    def _write(self, ops: list):
+        if not ops:
+            return
+        try:
+            with self._lock, self._conn:
+                for sql, params in ops:
+                    self._conn.execute(sql, params)
+            self._written += len(ops)
+            self._batches += 1
+        except sqlite3.Error:
+            self._errors += len(ops)
+            logger.exception("❌ Gagal menulis %d operasi transaksi", len(ops))
+
+    # ---------- API ----------
+    def simpan(self, session_id: str, nama: str, item: str, alamat: str, harga: str) -> str:
+        """Masukkan pesanan baru (status PENDING) ke antrian → order_id."""
+        order_id = uuid.uuid4().hex
+        self._queue.put((
+            "INSERT INTO transaksi (order_id, session_id, tanggal, nama, item, harga, alamat, status) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, 'PENDING')",
+            (order_id, session_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+             nama, item, harga, alamat)
+        ))
+        return order_id
+
+    def update_status(self, order_id: str, status: str, dari: str = "PENDING"):
+        """Ubah status SATU pesanan (order_id) jika masih berstatus `dari`."""
+        self._queue.put((
+            "UPDATE transaksi SET status = ? WHERE order_id = ? AND status = ?",
+            (status, order_id, dari)
+        ))
+
+    def flush(self):
+        """Tunggu sampai semua operasi di antrian tertulis."""
+        self._queue.join()
+
+    def close(self):
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+
+    def cari(self, nama: str = None, status: str = None, sejak: str = None, limit: int = 100) -> list:
+        syarat, params = [], []
+        for kolom, nilai, op in (("nama", nama, "="), ("status", status, "="), ("tanggal", sejak, ">=")):
+            if nilai is not None:
+                syarat.append(f"{kolom} {op} ?")
+                params.append(nilai)
+        where = f"WHERE {' AND '.join(syarat)}" if syarat else ""
+        with self._lock:
+            self._conn.row_factory = sqlite3.Row
+            rows = self._conn.execute(
+                f"SELECT * FROM transaksi {where} ORDER BY tanggal DESC LIMIT ?",
+                (*params, limit)
+            ).fetchall()
+            self._conn.row_factory = None
+        return [dict(r) for r in rows]
+
+    def stats(self) -> dict:
+        with self._lock:
+            per_status = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM transaksi GROUP BY status"
+            ).fetchall())
+        return {
+            "queued": self._queue.qsize(),
+            "written": self._written,
+            "batches": self._batches,
+            "errors": self._errors,
+            "per_status": per_status,
+        }
+
+    # ---------- migrasi ----------
+    def import_csv(self, csv_path: str) -> int:
+        """Import data_transaksi.csv lama. Aman dijalankan ulang (INSERT OR IGNORE)."""
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            rows = [
+                (f"csv-{i}", None, *(row.get(k, "") for k in KOLOM_CSV[:5]), row.get("Status") or "PENDING")
+                for i, row in enumerate(csv.DictReader(f), 1)
+            ]
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO transaksi (order_id, session_id, tanggal, nama, item, harga, alamat, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            return self._conn.total_changes - before
@@ -0,0 +1,204 @@
+# ======================================================
+# FILE: vector_engine.py
+# FASHA AI — In-Process NumPy Vector Search
+# ======================================================
+# Untuk katalog ribuan–puluhan ribu produk, brute-force dot product di
+# satu matriks float32 lebih cepat daripada round-trip llama_index +
+# Chroma per query. Semua embedding & metadata dimuat dari ./chroma_db
+# saat start, filter metadata dijalankan sebagai boolean mask.
+# Dimuat ulang otomatis saat index_version.txt berubah (lihat versioned_index.py).
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from llama_index.core.schema import NodeWithScore, TextNode
+from llama_index.core.vector_stores.utils import (
+    metadata_dict_to_node,
+    legacy_metadata_dict_to_node,
+)
+
+from src.versioned_index import VersionedIndex
+
+
+def node_from_record(node_id: str, text: str, metadata: dict):
+    """Rekonstruksi node persis seperti ChromaVectorStore."""
+    try:
+        return metadata_dict_to_node(metadata, text=text)
+    except Exception:
+        metadata, node_info, relationships = legacy_metadata_dict_to_node(metadata)
+        return TextNode(
+            text=text or "",
+            id_=node_id,
+            metadata=metadata,
+            start_char_idx=node_info.get("start", None),
+            end_char_idx=node_info.get("end", None),
+            relationships=relationships,
+        )
+
+
+
+def fetch_all(collection, include: list, page: int = 5000) -> dict:
+    """Seluruh isi koleksi Chroma, diambil per halaman."""
+    hasil = {"ids": [], **{key: [] for key in include}}
+    offset = 0
+    while True:
+        batch = collection.get(include=include, limit=page, offset=offset)
+        for key in hasil:
+            hasil[key].extend(batch[key])
+        if len(batch["ids"]) < page:
+            return hasil
+        offset += page
+
+
+# occasion di CSV berupa "Olahraga, Padel,tenis". Saat build tiap tag disimpan
+# sebagai field metadata sendiri ("occasion_padel": 1) agar Chroma (filter EQ)
+# dan FacetColumns memfilter dengan aturan yang sama: tag lowercase, cocok utuh.
+OCCASION_PREFIX = "occasion_"
+
+
+def occasion_tags(occasion) -> list:
+    """"Olahraga, Padel" → ["olahraga", "padel"]."""
+    return [tag.strip().lower() for tag in str(occasion or "").split(",") if tag.strip()]
+
+
+def occasion_key(tag: str) -> str:
+    return OCCASION_PREFIX + "_".join(tag.split())
+
+
+def occasion_fields(occasion) -> dict:
+    """Field metadata per tag occasion, ditulis 01_build_index.py."""
+    return {occasion_key(tag): 1 for tag in occasion_tags(occasion)}
+
+
+class FacetColumns:
+    """Kolom metadata sebagai array NumPy → filter facet jadi boolean mask."""
+
+    def __init__(self, metadatas: list):
+        kolom = lambda key: np.array([str((m or {}).get(key, "")) for m in metadatas], dtype=str)
+        self.size = len(metadatas)
+        self.tier = kolom("tier")
+        self.gender = kolom("gender")
+        self.kategori = kolom("kategori")
+        # field occasion_<tag> → boolean mask per tag
+        self.occasion = {}
+        for i, m in enumerate(metadatas):
+            for key in m or {}:
+                if key.startswith(OCCASION_PREFIX):
+                    self.occasion.setdefault(key, np.zeros(self.size, dtype=bool))[i] = True
+        self.harga = np.array([int((m or {}).get("harga") or 0) for m in metadatas], dtype=np.int64)
+
+    def mask(self, tier=None, gender=None, kategori=None, occasion=None,
+             min_harga=None, max_harga=None):
+        mask = np.ones(self.size, dtype=bool)
+        if tier:
+            mask &= self.tier == tier
+        if gender:
+            mask &= self.gender == gender
+        if kategori:
+            mask &= self.kategori == kategori
+        for tag in occasion_tags(occasion):
+            key = occasion_key(tag)
+            mask &= self.occasion[key] if key in self.occasion else False
+        if min_harga is not None:
+            mask &= self.harga >= int(min_harga)
+        if max_harga is not None:
+            mask &= self.harga <= int(max_harga)
+        return mask
+
+
+@dataclass(frozen=True)
+class VectorState:
+    matrix: np.ndarray   # baris ter-normalisasi
+    ids: list
+    metadatas: list
+    documents: list
+    facets: FacetColumns
+
+    @classmethod
+    def build(cls, matrix, ids, metadatas, documents):
+        return cls(matrix, ids, metadatas, documents, FacetColumns(metadatas))
+
+    def node(self, i: int, score: float) -> NodeWithScore:
+        return NodeWithScore(
+            node=node_from_record(self.ids[i], self.documents[i], self.metadatas[i]),
+            score=score
+        )
+
+
+class NumpyVectorEngine(VersionedIndex):
+    def __init__(self, collection, db_path: str = "./chroma_db", dtype: str = "float32"):
+        super().__init__(db_path)
+        self.collection = collection
+        self.dtype = np.dtype(dtype)
+        self.state  # muat sekarang, bukan saat query pertama
+
+    # ---------- loading ----------
+    def _load_state(self) -> VectorState:
+        data = fetch_all(self.collection, ["embeddings", "metadatas", "documents"])
+        matrix = np.asarray(data["embeddings"], dtype=np.float32)
+        if matrix.size:
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix = matrix / np.where(norms == 0, 1, norms)
+        return VectorState.build(
+            np.ascontiguousarray(matrix, dtype=self.dtype),
+            data["ids"], data["metadatas"], data["documents"]
+        )
+
+    def __len__(self):
+        return len(self.state.ids)
+
+    # ---------- search ----------
+    def search(self, query_embedding, top_k: int = 5, **facets):
+        state = self.state
+        if not len(state.ids):
+            return []
+
+        q = np.asarray(query_embedding, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        scores = state.matrix @ q.astype(state.matrix.dtype)
+
+        if any(v is not None for v in facets.values()):
+            scores = np.where(state.facets.mask(**facets), scores, -np.inf)
+
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        return [state.node(i, float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+    def search_many(self, query_embeddings, top_k: int = 5, facets: list = None):
+        """Top-k untuk banyak query dengan SATU perkalian matriks.
+
+        facets = list dict filter per query (boleh None) → list hasil search().
+        """
+        state = self.state
+        if not len(state.ids) or not len(query_embeddings):
+            return [[] for _ in query_embeddings]
+
+        q = np.asarray(query_embeddings, dtype=np.float32)
+        norms = np.linalg.norm(q, axis=1, keepdims=True)
+        q = q / np.where(norms == 0, 1, norms)
+        scores = q.astype(state.matrix.dtype) @ state.matrix.T
+
+        # mask dihitung sekali per kombinasi filter yang sama
+        masks = {}
+        for row, f in enumerate(facets or []):
+            f = {k: v for k, v in (f or {}).items() if v is not None}
+            if not f:
+                continue
+            key = tuple(sorted(f.items()))
+            if key not in masks:
+                masks[key] = state.facets.mask(**f)
+            scores[row] = np.where(masks[key], scores[row], -np.inf)
+
+        k = min(top_k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top = np.take_along_axis(
+            top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1
+        )
+
+        return [
+            [state.node(i, float(scores[row, i])) for i in top[row] if np.isfinite(scores[row, i])]
+            for row in range(len(top))
+        ]
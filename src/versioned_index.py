@@ -0,0 +1,47 @@
+# ======================================================
+# FILE: versioned_index.py
+# FASHA AI — Index In-Memory yang Mengikuti index_version.txt
+# ======================================================
+# ProductIndex, NumpyVectorEngine / SnapshotVectorEngine dan LexicalIndex
+# memuat isi koleksi ke memory dan memuat ulang saat 01_build_index.py
+# menulis index_version.txt.
+#
+# Hasil load disimpan sebagai SATU objek state immutable. Reload membangun
+# state baru lalu menukar referensinya sekaligus. Pencarian mengambil
+# `state = self.state` sekali di awal, sehingga thread executor yang sedang
+# mencari tidak pernah mencampur matriks baru dengan ids / metadata lama.
+
+import os
+import threading
+
+from src.answer_cache import INDEX_VERSION_FILE
+
+
+def version_mtime(db_path: str) -> float:
+    try:
+        return os.stat(os.path.join(db_path, INDEX_VERSION_FILE)).st_mtime
+    except OSError:
+        return 0.0
+
+
+class VersionedIndex:
+    def __init__(self, db_path: str = "./chroma_db"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._version_mtime = None
+        self._state = None
+
+    def _load_state(self):
+        """Bangun state baru dari koleksi (dipanggil di bawah lock)."""
+        raise NotImplementedError
+
+    @property
+    def state(self):
+        """State aktif, dimuat ulang dulu jika index_version.txt berubah."""
+        mtime = version_mtime(self.db_path)
+        if mtime != self._version_mtime:
+            with self._lock:
+                if mtime != self._version_mtime:
+                    self._state = self._load_state()
+                    self._version_mtime = mtime
+        return self._state